@@ -1,19 +1,18 @@
-import json
+import sys
+from pathlib import Path
 import pandas as pd
 import re
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.yelp_loader import load_yelp
+from src.utils.text_normalization import normalize_column, scrub_text
+
 # ======================================================
 # CLEANING HELPERS
 # ======================================================
 
-def clean_text(x):
-    if not x:
-        return ""
-    x = str(x).lower()
-    x = re.sub(r"[^a-z0-9 ]", " ", x)
-    x = re.sub(r"\s+", " ", x).strip()
-    return x
-
 def clean_phone(p):
     if not p:
         return ""
@@ -28,42 +27,28 @@ def load_and_normalize_yelp(path):
     """
     Loads Yelp dataset and outputs the same normalized fields used by the validation script.
     """
-    rows = []
-
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                obj = json.loads(line)
-            except:
-                continue
-
-            # Raw fields
-            business_id = obj.get("business_id", "")
-            raw_name = obj.get("name", "")
-            raw_phone = obj.get("phone", "")
-            raw_categories = obj.get("categories", "")
-
-            # Address parts
-            street = clean_text(obj.get("address", ""))
-            city   = clean_text(obj.get("city", ""))
-            state  = clean_text(obj.get("state", ""))
-            postal = clean_text(obj.get("postal_code", ""))
-
-            full_addr = clean_text(f"{street} {city} {state} {postal}")
-
-            rows.append({
-                "business_id": business_id,
-                "name": clean_text(raw_name),
-                "phone": clean_phone(raw_phone),
-                "categories": clean_text(str(raw_categories)),
-                "street": street,
-                "city": city,
-                "state": state,
-                "postal": postal,
-                "addr": full_addr,
-            })
-
-    return pd.DataFrame(rows)
+    raw = load_yelp(path, ["business_id", "name", "phone", "categories",
+                           "address", "city", "state", "postal_code"])
+
+    # Address parts
+    street = normalize_column(raw["address"], scrub_text)
+    city   = normalize_column(raw["city"], scrub_text)
+    state  = normalize_column(raw["state"], scrub_text)
+    postal = normalize_column(raw["postal_code"], scrub_text)
+
+    full_addr = normalize_column(street + " " + city + " " + state + " " + postal, scrub_text)
+
+    return pd.DataFrame({
+        "business_id": raw["business_id"],
+        "name": normalize_column(raw["name"], scrub_text),
+        "phone": raw["phone"].map(clean_phone),
+        "categories": normalize_column(raw["categories"].map(str), scrub_text),
+        "street": street,
+        "city": city,
+        "state": state,
+        "postal": postal,
+        "addr": full_addr,
+    })
 
 
 # ======================================================
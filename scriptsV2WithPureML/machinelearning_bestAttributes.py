@@ -1,15 +1,18 @@
+import numpy as np
 import pandas as pd
-import os, warnings
+import argparse, hashlib, os, time, warnings
 from pathlib import Path
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import LabelEncoder
-from joblib import dump, load
+from joblib import Parallel, delayed, dump, load
 
 warnings.filterwarnings("ignore")
 BASE = Path(__file__).resolve().parent.parent
 ATTRS = ["name", "phone", "address", "website", "categories"]
 PROVIDERS = ["foursquare", "meta", "microsoft"]
+TRAIN_WORKERS = -1  # joblib/loky processes for train(); 1 fits everything in-process
+FEATURE_CACHE = Path("models") / "feature_cache"
 
 # --- HELPERS ---
 def clean(x): return str(x).lower().strip() if pd.notna(x) else ""
@@ -17,29 +20,153 @@ def clean_src(s):
     s = clean(s)
     return "microsoft" if "msft" in s else "foursquare" if "four" in s else "meta" if "meta" in s else s
 
-def get_features(row, attr, is_train=False):
-    """Builds numerical feature vector for a specific attribute."""
-    f = {}
-    truth = clean(row.get(f"truth_{attr}")) if is_train else None
+# --- FEATURES ---
+FEATURE_NAMES = [f"{p}_{k}" for p in PROVIDERS for k in ("present", "sim", "exact")]
+
+def provider_values(wide, attr, p):
+    """Raw {p}_{attr} column of the wide pivot as an object array (None if the provider is absent)."""
+    col = f"{p}_{attr}"
+    if col in wide.columns: return wide[col].to_numpy(dtype=object)
+    return np.full(len(wide), None, dtype=object)
+
+def clean_column(vals):
+    """clean() over a whole column with pandas string ops."""
+    s = pd.Series(vals, dtype=object)
+    out = pd.Series("", index=s.index, dtype=object)
+    mask = s.notna()
+    out[mask] = s[mask].astype(str).str.lower().str.strip()
+    return out
+
+def token_overlap(vals, truth):
+    """Per row, len(set(val.split()) & set(truth.split())) via exploded (row, token) pairs."""
+    def pairs(col):
+        tok = col.str.split().explode().dropna()
+        return pd.DataFrame({"row": tok.index, "tok": tok.to_numpy()}).drop_duplicates()
+    common = pairs(vals).merge(pairs(truth), on=["row", "tok"])
+    return np.bincount(common["row"].to_numpy(dtype=np.int64), minlength=len(vals))
+
+def build_features(df, attr, is_train=False):
+    """Feature matrix (float32, len(df) x FEATURE_NAMES) for one attribute, computed column-wise.
+
+    Per provider: present, sim (train: token overlap with truth; inference: token
+    count as a richness proxy) and exact (train only: value equals truth).
+    """
+    X = np.zeros((len(df), len(FEATURE_NAMES)), dtype=np.float32)
+    truth = clean_column(provider_values(df, attr, "truth")) if is_train else None
+    for i, p in enumerate(PROVIDERS):
+        val = clean_column(provider_values(df, attr, p))
+        X[:, 3 * i] = val != ""
+        X[:, 3 * i + 1] = token_overlap(val, truth) if is_train else val.str.split().str.len()
+        if is_train: X[:, 3 * i + 2] = val == truth
+    return X
+
+def model_input(X, model):
+    """Feature matrix as model sees it, named with FEATURE_NAMES so models keep their fitted column names.
+
+    Forests work in float32 anyway; anything else (LogisticRegression) gets a float64 copy,
+    so it fits and predicts exactly as it did on the old per-row features.
+    """
+    if not isinstance(model, RandomForestClassifier): X = np.asarray(X, dtype=np.float64)
+    return pd.DataFrame(X, columns=FEATURE_NAMES, copy=False)
+
+def feature_frame(df, attr, model, is_train=False):
+    """build_features() prepared for model by model_input()."""
+    return model_input(build_features(df, attr, is_train), model)
+
+# --- BATCHED INFERENCE ---
+def is_blank(vals):
+    """Vectorized `pd.isna(v) or v == ""`."""
+    blank = pd.isna(vals)
+    blank[~blank] = vals[~blank] == ""
+    return blank
+
+def pick_values(wide, attr, pred_src):
+    """Value of the predicted source per row, falling back to the first non-empty provider."""
+    val = np.full(len(wide), None, dtype=object)
+    for src in np.unique(pred_src):
+        m = pred_src == src
+        val[m] = provider_values(wide, attr, src)[m]
+    need = is_blank(val)
     for p in PROVIDERS:
-        val = clean(row.get(f"{p}_{attr}"))
-        f[f"{p}_present"] = 1 if val else 0
-        # Train: overlap with Truth. Inference: length proxy (richness).
-        f[f"{p}_sim"] = len(set(val.split()) & set(truth.split())) if is_train else len(val.split())
-        f[f"{p}_exact"] = 1 if is_train and val == truth else 0
-    return f
+        if not need.any(): break
+        cand = provider_values(wide, attr, p)
+        ok = need & ~is_blank(cand)
+        val[ok] = cand[ok]
+        need &= ~ok
+    return val
+
+# --- MODEL REGISTRY ---
+# Loaded bundles keyed by model path; each entry remembers the file's
+# (mtime_ns, size) so a retrained model on disk is picked up on next use.
+_MODELS = {}
+
+def model_path(attr): return Path("models") / f"{attr}_model.joblib"
+
+def get_model(attr):
+    """Returns the {"model", "le"} bundle for attr, or None if it has not been trained."""
+    path = model_path(attr).resolve()
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        _MODELS.pop(path, None)
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _MODELS.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = _MODELS[path] = (stamp, load(path))
+    return cached[1]
+
+def load_models():
+    """Loads (or revalidates) every trained attribute model once; skips untrained ones."""
+    return {attr: bundle for attr in ATTRS if (bundle := get_model(attr)) is not None}
+
+# --- TRAINING SCHEDULER ---
+def candidate_models():
+    """Competition entrants, in tie-break order (the first best training score wins)."""
+    return [LogisticRegression(), RandomForestClassifier(n_estimators=100, random_state=42)]
+
+def cached_features(df, attr, key):
+    """Path of the .npy training matrix for attr, building it only if this golden set has none yet."""
+    path = FEATURE_CACHE / f"{attr}_{key}.npy"
+    if path.exists(): return path, True
+    FEATURE_CACHE.mkdir(parents=True, exist_ok=True)
+    for stale in FEATURE_CACHE.glob(f"{attr}_*.npy"): stale.unlink()
+    tmp = path.with_name(f"{path.stem}.tmp.npy")
+    np.save(tmp, build_features(df, attr, is_train=True))
+    os.replace(tmp, path)
+    return path, False
+
+def fit_candidate(attr, i, x_path, y_enc):
+    """Fits candidate model i on the memory-mapped features of attr; returns (attr, i, model, score, seconds)."""
+    t0 = time.perf_counter()
+    model = candidate_models()[i]
+    X = model_input(np.load(x_path, mmap_mode="r"), model)
+    score = model.fit(X, y_enc).score(X, y_enc)
+    return attr, i, model, score, time.perf_counter() - t0
+
+def print_timing_report(timings, wall):
+    print("\n=== Training Timing ===")
+    for attr, t in timings.items():
+        fits = " | ".join(f"{name} {secs:.2f}s acc={score:.3f}" for name, score, secs in t["fits"])
+        print(f"  {attr}: features {t['features']} | {fits} -> {t['winner']}")
+    print(f"  wall: {wall:.2f}s")
 
 # --- CORE LOGIC ---
-def train():
+def train(workers=TRAIN_WORKERS):
     print("=== Training Models ===")
+    golden = Path("ML_GOLDEN_DATASET.csv")
     try:
-        df = pd.read_csv("ML_GOLDEN_DATASET.csv")
+        df = pd.read_csv(golden)
     except FileNotFoundError:
         print("Error: ML_GOLDEN_DATASET_TEMPLATE.csv not found.")
         return
 
     os.makedirs("models", exist_ok=True)
-    
+    t_start = time.perf_counter()
+    # Cached feature matrices are only valid for this exact golden file and feature layout
+    key = hashlib.sha1(golden.read_bytes() + ",".join(FEATURE_NAMES).encode()).hexdigest()[:12]
+    jobs, encoders, timings = [], {}, {}
+
     for attr in ATTRS:
         # Check if columns exist before training
         if f"truth_{attr}_source" not in df.columns:
@@ -50,7 +177,6 @@ def train():
         valid_rows = df[df[f"truth_{attr}_source"].notna() & (df[f"truth_{attr}_source"] != "")]
         if valid_rows.empty: continue
             
-        X = pd.DataFrame([get_features(r, attr, True) for _, r in valid_rows.iterrows()])
         y = valid_rows[f"truth_{attr}_source"].apply(clean).values
         
         if len(set(y)) < 2:
@@ -59,25 +185,39 @@ def train():
 
         le = LabelEncoder()
         y_enc = le.fit_transform(y)
-        
-        # Competiton: LogReg vs Random Forest
-        models = [LogisticRegression(), RandomForestClassifier(n_estimators=100, random_state=42)]
-        best = max(models, key=lambda m: m.fit(X, y_enc).score(X, y_enc))
-        
-        dump({"model": best, "le": le}, f"models/{attr}_model.joblib")
+
+        t0 = time.perf_counter()
+        x_path, hit = cached_features(valid_rows, attr, key)
+        timings[attr] = {"features": "cached" if hit else f"{time.perf_counter() - t0:.2f}s", "fits": []}
+        encoders[attr] = le
+        jobs += [delayed(fit_candidate)(attr, i, str(x_path), y_enc) for i in range(len(candidate_models()))]
+
+    # Competiton: LogReg vs Random Forest, every (attribute, model) fit scheduled at once
+    fitted = {}
+    for attr, i, model, score, secs in Parallel(n_jobs=workers, backend="loky")(jobs):
+        fitted.setdefault(attr, {})[i] = (model, score)
+        timings[attr]["fits"].append((model.__class__.__name__, score, secs))
+
+    for attr, le in encoders.items():
+        ranked = [fitted[attr][i] for i in sorted(fitted[attr])]
+        best = max(ranked, key=lambda ms: ms[1])[0]
+        timings[attr]["winner"] = best.__class__.__name__
+
+        dump({"model": best, "le": le}, model_path(attr))
         print(f"  {attr}: Trained {best.__class__.__name__}")
 
+    print_timing_report(timings, time.perf_counter() - t_start)
+
 def infer():
     print("\n=== Running Inference ===")
     
     # 1. Load and Fix Raw Data
-    csv_path = "NORMALIZED_SOURCES.csv"
+    csv_path = Path("NORMALIZED_SOURCES.csv")
     if not csv_path.exists():
-        csv_path = "NORMALIZED_SOURCES.csv" # try local directory
-        if not os.path.exists(csv_path):
-             print(f"Error: {csv_path} not found.")
-             return
+        print(f"Error: {csv_path} not found.")
+        return
 
+    models = load_models()
     raw = pd.read_csv(csv_path)
     
     # --- ROBUSTNESS FIX ---
@@ -102,39 +242,22 @@ def infer():
     wide.columns = [f"{col[1]}_{col[0]}" for col in wide.columns] 
     wide = wide.reset_index()
 
-    results = []
-    for _, row in wide.iterrows():
-        res = {"place_id": row["place_id"]}
-        votes = []
-        
-        for attr in ATTRS:
-            try:
-                # Load Model & Predict
-                model_path = f"models/{attr}_model.joblib"
-                if not os.path.exists(model_path): continue
-
-                bundle = load(model_path)
-                feats = pd.DataFrame([get_features(row, attr, False)]) # Build features from wide row
-                pred_src = bundle["le"].inverse_transform(bundle["model"].predict(feats))[0]
-                
-                # Pick Value (Fallback to first available if prediction is empty)
-                val = row.get(f"{pred_src}_{attr}")
-                if pd.isna(val) or val == "":
-                    for p in PROVIDERS:
-                        v = row.get(f"{p}_{attr}")
-                        if pd.notna(v) and v != "": val = v; break
-                
-                res[f"best_{attr}"] = val
-                res[f"{attr}_source"] = pred_src
-                votes.append(pred_src)
-            except Exception as e: 
-                # print(f"Error predicting {attr}: {e}")
-                pass
-            
-        if votes: res["best_source"] = max(set(votes), key=votes.count)
-        results.append(res)
+    # One predict() per attribute over all places, then vectorized value picks
+    out = pd.DataFrame({"place_id": wide["place_id"].to_numpy()})
+    sources = []
+    for attr, bundle in models.items():
+        try:
+            feats = feature_frame(wide, attr, bundle["model"])
+            pred_src = bundle["le"].inverse_transform(bundle["model"].predict(feats))
+            out[f"best_{attr}"] = pick_values(wide, attr, pred_src)
+            out[f"{attr}_source"] = pred_src
+            sources.append(pred_src)
+        except Exception as e:
+            # print(f"Error predicting {attr}: {e}")
+            pass
 
-    out = pd.DataFrame(results)
+    if sources:
+        out["best_source"] = [max(set(votes), key=votes.count) for votes in map(list, zip(*sources))]
     
     # --- COMPATIBILITY FIX ---
     # The evaluation script expects 'best_category' (singular), but we generated 'best_categories' (plural).
@@ -150,5 +273,9 @@ def infer():
     print(f"Done. Wrote {len(out)} rows to ML_BEST_ATTRIBUTES.csv")
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train per-attribute source selectors and pick best attributes.")
+    parser.add_argument("--workers", type=int, default=TRAIN_WORKERS,
+                        help="joblib processes for training (-1 = all cores, 1 = in-process)")
+    args = parser.parse_args()
+    train(workers=args.workers)
     infer()
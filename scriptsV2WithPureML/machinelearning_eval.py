@@ -1,10 +1,18 @@
+import sys
+from pathlib import Path
 import pandas as pd
 import ast
 import json
-from rapidfuzz import fuzz
+
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.evaluation import evaluate, write_mismatches
+from src.utils.text_normalization import alnum_text
 
 GOLD = "ML_GOLDEN_DATASET.csv"
 PRED = "ML_BEST_ATTRIBUTES.csv"
+MISMATCHES = "ML_EVAL_MISMATCHES.csv"
 
 try:
     df_g = pd.read_csv(GOLD)
@@ -34,12 +42,6 @@ def clean_phone(p):
     digits = "".join([d for d in str(p) if d.isdigit()])
     return digits[-10:]  # last 10 digits (US phones)
 
-def clean_name(n):
-    if pd.isna(n): return ""
-    n = str(n).lower()
-    n = "".join(c if c.isalnum() or c==" " else " " for c in n)
-    return " ".join(n.split())
-
 def clean_website(w):
     if pd.isna(w): return ""
     w = str(w).lower()
@@ -47,10 +49,17 @@ def clean_website(w):
         w = w.replace(prefix, "")
     return w.split("/")[0]
 
+def as_json(v):
+    """json.loads for text; lists/dicts from typed (Parquet) columns are already parsed."""
+    return v if isinstance(v, (list, dict)) else json.loads(v)
+
+def is_missing(v):
+    return not isinstance(v, (list, dict)) and pd.isna(v)
+
 def clean_category(c):
-    if pd.isna(c): return ""
+    if is_missing(c): return ""
     try:
-        obj = json.loads(c)
+        obj = as_json(c)
         if isinstance(obj, dict):
             return obj.get("primary","").lower()
     except:
@@ -58,9 +67,9 @@ def clean_category(c):
     return str(c).lower()
 
 def clean_address(a):
-    if pd.isna(a): return ""
+    if is_missing(a): return ""
     try:
-        obj = json.loads(a)
+        obj = as_json(a)
         if isinstance(obj, dict):
             a = " ".join([
                 obj.get("freeform",""),
@@ -82,18 +91,15 @@ def clean_address(a):
     except:
         pass
 
-    a = str(a).lower()
-    a = "".join(c if c.isalnum() or c==" " else " " for c in a)
-    a = " ".join(a.split())
-    return a
+    return alnum_text(str(a))
 
-# Dispatcher
-def normalize(val, field):
-    if field == "phone": return clean_phone(val)
-    if field == "address": return clean_address(val)
-    if field == "website": return clean_website(val)
-    if field == "category": return clean_category(val)
-    return clean_name(val)
+NORMALIZERS = {
+    "name":     alnum_text,
+    "phone":    clean_phone,
+    "address":  clean_address,
+    "website":  clean_website,
+    "category": clean_category,
+}
 
 # --------------------------------------------------------
 # EVALUATION METRICS
@@ -101,61 +107,12 @@ def normalize(val, field):
 print(f"\n{'ATTRIBUTE':<12} | {'ACCURACY':<10} | {'PRECISION':<10} | {'RECALL':<10} | {'F1 SCORE':<10}")
 print("-" * 65)
 
-metrics_list = []
-
-for field, (truth_col, pred_col) in ATTRS.items():
-    
-    tp = 0              # True Positives (Match)
-    pred_count = 0      # Total Non-Empty Predictions (TP + FP)
-    truth_count = 0     # Total Non-Empty Truths (TP + FN)
-    intersect_count = 0 # Count where BOTH exist (for pure accuracy)
-    intersect_correct = 0
-
-    for _, row in df.iterrows():
-        t_raw = row.get(truth_col, "")
-        p_raw = row.get(pred_col, "")
-
-        # Check existence (non-empty strings)
-        has_truth = pd.notna(t_raw) and str(t_raw).strip() != ""
-        has_pred = pd.notna(p_raw) and str(p_raw).strip() != ""
-
-        if has_truth: truth_count += 1
-        if has_pred: pred_count += 1
-
-        # Logic: Only check match if both exist
-        if has_truth and has_pred:
-            intersect_count += 1
-            
-            t_n = normalize(t_raw, field)
-            p_n = normalize(p_raw, field)
-
-            # Match Condition: Exact OR Fuzzy >= 90
-            if t_n == p_n or fuzz.ratio(t_n, p_n) >= 90:
-                tp += 1
-                intersect_correct += 1
-
-    # Metrics Calculation
-    # 1. Accuracy (Intersection Match Rate)
-    accuracy = (intersect_correct / intersect_count * 100) if intersect_count > 0 else 0.0
-
-    # 2. Precision (TP / Total Preds)
-    precision = (tp / pred_count * 100) if pred_count > 0 else 0.0
-
-    # 3. Recall (TP / Total Truths)
-    recall = (tp / truth_count * 100) if truth_count > 0 else 0.0
-
-    # 4. F1 Score (2 * (P*R)/(P+R))
-    if (precision + recall) > 0:
-        f1 = 2 * (precision * recall) / (precision + recall)
-    else:
-        f1 = 0.0
-
-    print(f"{field:<12} | {accuracy:6.2f}%    | {precision:6.2f}%    | {recall:6.2f}%    | {f1:6.2f}%")
-    
-    # Store for overall average
-    metrics_list.append({
-        "acc": accuracy, "prec": precision, "rec": recall, "f1": f1
-    })
+# Presence is checked on the raw values; a pair matches on exact OR fuzzy >= 90 after normalization
+results, mismatches = evaluate(df, ATTRS, NORMALIZERS, presence="raw")
+metrics_list = list(results.values())
+
+for field, m in results.items():
+    print(f"{field:<12} | {m['acc']:6.2f}%    | {m['prec']:6.2f}%    | {m['rec']:6.2f}%    | {m['f1']:6.2f}%")
 
 # Overall Averages
 avg_acc = sum(m["acc"] for m in metrics_list) / len(metrics_list)
@@ -166,3 +123,5 @@ avg_f1 = sum(m["f1"] for m in metrics_list) / len(metrics_list)
 print("-" * 65)
 print(f"{'OVERALL':<12} | {avg_acc:6.2f}%    | {avg_prec:6.2f}%    | {avg_rec:6.2f}%    | {avg_f1:6.2f}%")
 print("\n")
+n = write_mismatches(mismatches, MISMATCHES)
+print(f"Wrote {n} mismatch samples to {MISMATCHES}")
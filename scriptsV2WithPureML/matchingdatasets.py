@@ -4,27 +4,47 @@ matchingdatasets_fast.py
 
 Optimized matching pipeline:
 - Chunked processing (default 5k Yelp rows / chunk)
-- Spatial nearest join -> local bbox candidate selection -> RapidFuzz on local set
-- Intermediate chunk saves to ../data/interim to be resumable
+- One dwithin R-tree query per chunk -> nearest join + candidate sets -> RapidFuzz on local set
+- Intermediate chunk saves to ../data/interim to be resumable: a per-target
+  manifest records each chunk's input range, config hash, target file hash
+  and output path, and completed chunks are skipped on restart (--no-resume
+  to recompute)
+- Optional process pool over chunks (--workers N)
+- Optional spatial locality (--spatial-order): Yelp rows are sorted along a
+  Hilbert curve before chunking and each chunk matches against the targets
+  near its bbox only, through a small per-chunk R-tree
 """
 
+import argparse
+import hashlib
+import json
 import math
 import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point
-from unidecode import unidecode
+import shapely
 from rapidfuzz import process, fuzz
 from geopandas.tools import sjoin_nearest
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import sys
 import warnings
 import time
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.interim_storage import interim_path, find_interim, read_interim, write_interim, export_geojson
+from src.utils.projection_cache import load_projected
+from src.utils.yelp_loader import load_yelp
+from src.utils.text_normalization import fold_text, normalize_column
+
 warnings.filterwarnings('ignore', 'GeoSeries.notna', UserWarning)
 
 YELP_JSON = "../data/raw/yelp_academic_dataset_business.json"
-OMF_GEOJSON = "../data/interim/omf_all_merged.geojson"
-OVERPASS_GEOJSON = "../data/interim/overpass_all_merged.geojson"
+OMF_MERGED = "../data/interim/omf_all_merged"
+OVERPASS_MERGED = "../data/interim/overpass_all_merged"
 OUT_DIR = Path("../data/interim")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -32,16 +52,14 @@ CHUNK_SIZE = 5000
 MAX_DISTANCE_METERS = 1000 #can change this to more lenient
 FUZZY_SCORE_THRESHOLD = 80
 SAVE_EVERY_CHUNK = True
+BATCHED_MATCHING = True  # False falls back to the row-by-row process_chunk
+SCORER_WORKERS = -1  # rapidfuzz threads per process; pool workers use 1
+SPATIAL_ORDER = False  # --spatial-order
 
 OMF_CHUNK_PREFIX = OUT_DIR / "yelp_omf_chunk"
 OVERPASS_CHUNK_PREFIX = OUT_DIR / "yelp_overpass_chunk"
-FINAL_OMF_OUT = OUT_DIR / "yelp_omf_matched.geojson"
-FINAL_OVERPASS_OUT = OUT_DIR / "yelp_overpass_matched.geojson"
-
-def clean_text(x):
-    if pd.isnull(x) or str(x).strip() == "":
-        return None
-    return unidecode(str(x).strip().lower())
+FINAL_OMF_OUT = interim_path(OUT_DIR / "yelp_omf_matched")
+FINAL_OVERPASS_OUT = interim_path(OUT_DIR / "yelp_overpass_matched")
 
 def ensure_cols(gdf, required):
     for c in required:
@@ -49,46 +67,49 @@ def ensure_cols(gdf, required):
             gdf[c] = None
     return gdf
 
-print("Loading Yelp (CSV/JSON) and target GeoJSONs...")
+def load_inputs():
+    """
+    Loads Yelp and both target datasets, projected to EPSG:3857.
+    Returns (yelp_proj, omf_proj, overpass_proj).
+    """
+    print("Loading Yelp (CSV/JSON) and merged target datasets...")
 
-yelp_df = pd.read_json(YELP_JSON, lines=True)
-yelp_df = yelp_df[[
-    "business_id", "name", "address", "city", "state", "postal_code",
-    "latitude", "longitude", "categories"
-]]
+    yelp_df = load_yelp(YELP_JSON, [
+        "business_id", "name", "address", "city", "state", "postal_code",
+        "latitude", "longitude", "categories"
+    ])
 
-for col in ["name", "address", "city", "state"]:
-    yelp_df[col] = yelp_df[col].apply(clean_text)
+    for col in ["name", "address", "city", "state"]:
+        yelp_df[col] = normalize_column(yelp_df[col], fold_text, missing=None)
 
-yelp_df = yelp_df.dropna(subset=["latitude", "longitude", "name"]).reset_index(drop=True)
+    yelp_df = yelp_df.dropna(subset=["latitude", "longitude", "name"]).reset_index(drop=True)
 
-yelp_gdf = gpd.GeoDataFrame(
-    yelp_df,
-    geometry=gpd.points_from_xy(yelp_df.longitude, yelp_df.latitude),
-    crs="EPSG:4326"
-)
+    yelp_gdf = gpd.GeoDataFrame(
+        yelp_df,
+        geometry=gpd.points_from_xy(yelp_df.longitude, yelp_df.latitude),
+        crs="EPSG:4326"
+    )
 
-omf_gdf = gpd.read_file(OMF_GEOJSON)
-overpass_gdf = gpd.read_file(OVERPASS_GEOJSON)
+    # Targets come back already in EPSG:3857, from the projected-geometry cache when current
+    omf_proj = load_projected(find_interim(OMF_MERGED))
+    overpass_proj = load_projected(find_interim(OVERPASS_MERGED))
 
-omf_gdf = ensure_cols(omf_gdf, ["id", "name", "address", "geometry"])
-overpass_gdf = ensure_cols(overpass_gdf, ["id", "name", "address", "geometry"])
+    omf_proj = ensure_cols(omf_proj, ["id", "name", "address", "geometry"])
+    overpass_proj = ensure_cols(overpass_proj, ["id", "name", "address", "geometry"])
 
-omf_gdf = omf_gdf.dropna(subset=["geometry"]).reset_index(drop=True)
-overpass_gdf = overpass_gdf.dropna(subset=["geometry"]).reset_index(drop=True)
+    omf_proj = omf_proj.dropna(subset=["geometry"]).reset_index(drop=True)
+    overpass_proj = overpass_proj.dropna(subset=["geometry"]).reset_index(drop=True)
 
-print(f"Yelp rows: {len(yelp_gdf):,}, OMF rows: {len(omf_gdf):,}, Overpass rows: {len(overpass_gdf):,}")
+    print(f"Yelp rows: {len(yelp_gdf):,}, OMF rows: {len(omf_proj):,}, Overpass rows: {len(overpass_proj):,}")
 
-yelp_proj = yelp_gdf.to_crs(epsg=3857).copy()
-omf_proj = omf_gdf.to_crs(epsg=3857).copy()
-overpass_proj = overpass_gdf.to_crs(epsg=3857).copy()
+    yelp_proj = yelp_gdf.to_crs(epsg=3857)
 
-omf_proj["name_clean"] = omf_proj["name"].apply(clean_text)
-overpass_proj["name_clean"] = overpass_proj["name"].apply(clean_text)
-yelp_proj["name_clean"] = yelp_proj["name"].apply(clean_text)
+    omf_proj["name_clean"] = normalize_column(omf_proj["name"], fold_text, missing=None)
+    overpass_proj["name_clean"] = normalize_column(overpass_proj["name"], fold_text, missing=None)
+    # Yelp names were already folded above
+    yelp_proj["name_clean"] = yelp_proj["name"]
 
-omf_index = omf_proj.sindex
-overpass_index = overpass_proj.sindex
+    return yelp_proj, omf_proj, overpass_proj
 
 def process_chunk(yelp_chunk, target_proj, target_index, target_name_col="name_clean"):
     """
@@ -129,7 +150,7 @@ def process_chunk(yelp_chunk, target_proj, target_index, target_name_col="name_c
         buf = src_geom.buffer(MAX_DISTANCE_METERS)
         minx, miny, maxx, maxy = buf.bounds
 
-        candidate_idx = list(target_index.intersection((minx, miny, maxx, maxy)))
+        candidate_idx = sorted(target_index.intersection((minx, miny, maxx, maxy)))
         if not candidate_idx:
             matched_candidate_ids.append(None)
             matched_candidate_names.append(None)
@@ -182,43 +203,367 @@ def process_chunk(yelp_chunk, target_proj, target_index, target_name_col="name_c
 
     return joined
 
-def run_matching_all_chunks(yelp_proj, target_proj, target_index, chunk_prefix):
+# --------------------------------------------------------------
+# Spatial candidates (one dwithin query per chunk)
+# --------------------------------------------------------------
+def candidate_pairs(yelp_chunk, target_proj, target_index, max_distance=MAX_DISTANCE_METERS):
+    """
+    Every (yelp_idx, target_idx, distance) triple with distance <= max_distance,
+    positional on both sides, from a single bulk sindex.query(predicate="dwithin").
+    Pairs are sorted by Yelp row, then target row, so ties never depend on
+    the R-tree layout (global or per chunk).
+    """
+    src_geoms = np.asarray(yelp_chunk.geometry.values, dtype=object)
+    yelp_idx, target_idx = target_index.query(src_geoms, predicate="dwithin", distance=max_distance)
+    order = np.lexsort((target_idx, yelp_idx))
+    yelp_idx, target_idx = yelp_idx[order], target_idx[order]
+    target_geoms = np.asarray(target_proj.geometry.values, dtype=object)
+    return yelp_idx, target_idx, shapely.distance(src_geoms[yelp_idx], target_geoms[target_idx])
+
+def nearest_indexer(yelp_idx, target_idx, dist, n):
+    """
+    Left-join indexer over n Yelp rows: the candidate pairs at each row's
+    minimum distance (all of them on ties), plus target -1 / distance NaN for
+    rows without a candidate. Sorted by Yelp row.
+    """
+    nearest = np.full(n, np.inf)
+    np.minimum.at(nearest, yelp_idx, dist)
+    keep = dist == nearest[yelp_idx]
+    yelp_idx, target_idx, dist = yelp_idx[keep], target_idx[keep], dist[keep]
+
+    unmatched = np.flatnonzero(np.isinf(nearest))
+    at = np.searchsorted(yelp_idx, unmatched)
+    return (np.insert(yelp_idx, at, unmatched), np.insert(target_idx, at, -1),
+            np.insert(dist, at, np.nan))
+
+def nearest_join(yelp_chunk, target_proj, yelp_idx, target_idx, dist, distance_col="distance_m"):
+    """
+    The frame sjoin_nearest(yelp_chunk, target_proj, how="left", distance_col=...)
+    returns, built from a nearest_indexer(): one row per nearest target (ties
+    repeat the Yelp row), empty target columns for unmatched rows,
+    index_right, and _left/_right suffixes on shared column names. Tied
+    targets come in target row order, where GEOS nearest uses its search order.
+    """
+    left = yelp_chunk.take(yelp_idx)
+    right = target_proj.drop(columns=target_proj.geometry.name)
+    right = right.reset_index().rename(columns={"index": "index_right"}) if right.index.name is None else right.reset_index()
+    shared = left.columns.intersection(right.columns).drop(yelp_chunk.geometry.name, errors="ignore")
+    left = left.rename(columns={c: f"{c}_left" for c in shared})
+    right = right.rename(columns={c: f"{c}_right" for c in shared}).reindex(target_idx)  # -1 -> empty row
+
+    right.index = left.index
+    joined = pd.concat([left, right], axis=1)
+    joined[distance_col] = dist
+    return joined
+
+def process_chunk_batched(yelp_chunk, target_proj, target_index, target_name_col="name_clean"):
+    """
+    Batched version of process_chunk with identical output columns.
+    One dwithin query gives all (yelp, target, distance) pairs for the chunk;
+    the nearest-target join and the fuzzy candidate sets both come from it,
+    with pairwise WRatio scoring via rapidfuzz.process.cpdist.
+    Ties resolve to the first candidate in target row order, as in extractOne.
+    """
+    n = len(yelp_chunk)
+    pair_rows, cand_idx, dist = candidate_pairs(yelp_chunk, target_proj, target_index)
+    join_rows, join_targets, join_dist = nearest_indexer(pair_rows, cand_idx, dist, n)
+    joined = nearest_join(yelp_chunk, target_proj, join_rows, join_targets, join_dist)
+    if "name_left" in joined.columns:
+        source_name_col = "name_left"
+    elif "name" in joined.columns:
+        source_name_col = "name"
+    else:
+        source_name_col = "name_clean"
+
+    # Scored once per Yelp row; join_rows spreads results over distance-tie duplicates
+    src_names = np.empty(n, dtype=object)
+    src_names[join_rows] = joined[source_name_col].to_numpy(dtype=object)
+    matched_ids = np.full(n, None, dtype=object)
+    matched_names = np.full(n, None, dtype=object)
+    matched_scores = np.full(n, None, dtype=object)
+
+    named = ~pd.isnull(src_names[pair_rows])
+    pair_rows, cand_idx = pair_rows[named], cand_idx[named]
+    if len(pair_rows):
+        target_names = target_proj[target_name_col].fillna("").to_numpy(dtype=object)
+        cand_names = target_names[cand_idx]
+        scores = process.cpdist(
+            src_names[pair_rows], cand_names,
+            scorer=fuzz.WRatio, dtype=np.float64, workers=SCORER_WORKERS
+        )
+
+        # Best candidate per row: highest score, earliest target row on ties
+        order = np.lexsort((np.arange(len(scores)), -scores, pair_rows))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pair_rows[order][1:] != pair_rows[order][:-1]
+        best = order[first]
+        best = best[scores[best] >= FUZZY_SCORE_THRESHOLD]
+
+        target_ids = target_proj["id"].to_numpy(dtype=object)
+        matched_ids[pair_rows[best]] = target_ids[cand_idx[best]]
+        matched_names[pair_rows[best]] = cand_names[best]
+        matched_scores[pair_rows[best]] = [int(sc) for sc in scores[best]]
+
+    joined["matched_id"] = matched_ids[join_rows].tolist()
+    joined["matched_name"] = matched_names[join_rows].tolist()
+    joined["matched_name_score"] = matched_scores[join_rows].tolist()
+    joined["distance_m_final"] = joined["distance_m"].tolist()
+
+    return joined
+
+# --------------------------------------------------------------
+# Spatial locality (--spatial-order)
+# --------------------------------------------------------------
+YELP_POS = "_yelp_pos"  # original row position, carried through the chunks in spatial order
+
+def hilbert_order(gdf):
+    """Row positions of gdf sorted along a Hilbert curve over its total bounds."""
+    return np.argsort(gdf.geometry.hilbert_distance().to_numpy(), kind="stable")
+
+def spatially_ordered(yelp_proj):
+    """yelp_proj in Hilbert order, with each row's original position in YELP_POS."""
+    order = hilbert_order(yelp_proj)
+    return yelp_proj.iloc[order].reset_index(drop=True).assign(**{YELP_POS: order})
+
+def local_target(yelp_chunk, target_proj, target_index, margin=MAX_DISTANCE_METERS):
+    """
+    The targets whose bbox meets the chunk's bbox grown by margin (a superset
+    of every dwithin candidate of the chunk), with their own R-tree. Keeps
+    target labels, so index_right still refers to the full frame.
+    """
+    minx, miny, maxx, maxy = yelp_chunk.total_bounds
+    pos = target_index.query(shapely.box(minx - margin, miny - margin, maxx + margin, maxy + margin))
+    local = target_proj.iloc[np.sort(pos)]
+    return local, local.sindex
+
+def restore_order(matched):
+    """Rows matched from spatially_ordered() input back in the original Yelp order, without YELP_POS.
+    Rows repeated on distance ties stay together."""
+    matched = matched.sort_values(YELP_POS, kind="stable").reset_index(drop=True)
+    return matched.drop(columns=YELP_POS)
+
+# --------------------------------------------------------------
+# Chunk checkpoints
+# --------------------------------------------------------------
+def config_hash():
+    """Short hash of the settings that change chunk contents."""
+    cfg = {
+        "MAX_DISTANCE_METERS": MAX_DISTANCE_METERS,
+        "FUZZY_SCORE_THRESHOLD": FUZZY_SCORE_THRESHOLD,
+        "CHUNK_SIZE": CHUNK_SIZE,
+        "SPATIAL_ORDER": SPATIAL_ORDER,
+        "BATCHED_MATCHING": BATCHED_MATCHING,
+    }
+    return hashlib.sha1(json.dumps(cfg, sort_keys=True).encode()).hexdigest()[:12]
+
+def manifest_path(chunk_prefix):
+    return Path(f"{chunk_prefix}_manifest.json")
+
+def load_manifest(chunk_prefix):
+    path = manifest_path(chunk_prefix)
+    if not path.exists():
+        return {"chunks": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(chunk_prefix, manifest):
+    """Write-then-rename so a crash never leaves a half-written manifest."""
+    path = manifest_path(chunk_prefix)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+def chunk_entry(yelp_proj, target_proj, start, end, chunk_file):
+    """Manifest record of a chunk; target_hash is the load_projected() source hash of the target file."""
+    return {
+        "start": start,
+        "end": end,
+        "first_business_id": yelp_proj["business_id"].iloc[start],
+        "last_business_id": yelp_proj["business_id"].iloc[end - 1],
+        "config_hash": config_hash(),
+        "target_hash": target_proj.attrs.get("source_hash"),
+        "output": str(chunk_file),
+    }
+
+def completed_chunk_file(manifest, yelp_proj, target_proj, chunk_no, start, end):
+    """Returns the saved chunk file if the manifest says this chunk is done, else None."""
+    entry = manifest["chunks"].get(str(chunk_no))
+    if entry is None:
+        return None
+    expected = chunk_entry(yelp_proj, target_proj, start, end, entry["output"])
+    if entry != expected or not Path(entry["output"]).exists():
+        return None
+    return Path(entry["output"])
+
+def chunk_bounds(n):
+    """Yields (chunk_no, start, end) for CHUNK_SIZE slices of n rows."""
+    for i in range(math.ceil(n / CHUNK_SIZE)):
+        yield i + 1, i * CHUNK_SIZE, min((i + 1) * CHUNK_SIZE, n)
+
+def match_and_save_chunk(yelp_chunk, target_proj, target_index, chunk_prefix, chunk_no):
+    t0 = time.time()
+    if SPATIAL_ORDER:
+        target_proj, target_index = local_target(yelp_chunk, target_proj, target_index)
+    chunk_fn = process_chunk_batched if BATCHED_MATCHING else process_chunk
+    matched_chunk = chunk_fn(yelp_chunk, target_proj, target_index)
+    t1 = time.time()
+
+    chunk_file = write_interim(matched_chunk, f"{chunk_prefix}_{chunk_no}")
+    return chunk_file, t1 - t0
+
+def concat_chunk_files(chunk_files):
+    print("Concatenating chunk files...")
+    gdfs = [read_interim(p) for p in chunk_files]
+    return gpd.GeoDataFrame(pd.concat(gdfs, ignore_index=True), crs=gdfs[0].crs)
+
+def run_matching_all_chunks(yelp_proj, target_proj, target_index, chunk_prefix, resume=True):
     n = len(yelp_proj)
     n_chunks = math.ceil(n / CHUNK_SIZE)
     chunk_files = []
+    manifest = load_manifest(chunk_prefix) if resume else {"chunks": {}}
 
-    for i in range(n_chunks):
-        start = i * CHUNK_SIZE
-        end = min((i + 1) * CHUNK_SIZE, n)
-        print(f"\nProcessing chunk {i+1}/{n_chunks}: rows {start}..{end-1} (size {end-start})")
-        yelp_chunk = yelp_proj.iloc[start:end].copy()
+    for chunk_no, start, end in chunk_bounds(n):
+        done = completed_chunk_file(manifest, yelp_proj, target_proj, chunk_no, start, end)
+        if done is not None:
+            print(f"Skipping chunk {chunk_no}/{n_chunks}: already saved to {done}")
+            chunk_files.append(done)
+            continue
 
-        t0 = time.time()
-        matched_chunk = process_chunk(yelp_chunk, target_proj, target_index)
-        t1 = time.time()
-        print(f"Chunk processed in {t1-t0:.1f}s")
+        print(f"\nProcessing chunk {chunk_no}/{n_chunks}: rows {start}..{end-1} (size {end-start})")
+        yelp_chunk = yelp_proj.iloc[start:end].copy()
 
-        chunk_file = Path(f"{chunk_prefix}_{i+1}.geojson")
-        matched_chunk.to_file(chunk_file, driver="GeoJSON")
+        chunk_file, elapsed = match_and_save_chunk(yelp_chunk, target_proj, target_index, chunk_prefix, chunk_no)
+        print(f"Chunk processed in {elapsed:.1f}s")
         print(f"Saved chunk to {chunk_file} ({chunk_file.stat().st_size/1024/1024:.2f} MB)")
         chunk_files.append(chunk_file)
 
-    print("Concatenating chunk files...")
-    gdfs = [gpd.read_file(str(p)) for p in chunk_files]
-    all_matched = gpd.GeoDataFrame(pd.concat(gdfs, ignore_index=True), crs=gdfs[0].crs)
+        manifest["chunks"][str(chunk_no)] = chunk_entry(yelp_proj, target_proj, start, end, chunk_file)
+        save_manifest(chunk_prefix, manifest)
+
+    all_matched = concat_chunk_files(chunk_files)
     # save final
     return all_matched, chunk_files
 
-if __name__ == "__main__":
-    print("\n=== MATCHING: Yelp -> OMF ===")
-    omf_matched_gdf, omf_chunks = run_matching_all_chunks(yelp_proj, omf_proj, omf_index, OMF_CHUNK_PREFIX)
-    omf_matched_gdf.to_file(FINAL_OMF_OUT, driver="GeoJSON")
-    print(f"Final OMF matched saved to {FINAL_OMF_OUT} ({FINAL_OMF_OUT.stat().st_size/1024/1024:.2f} MB)")
+# --------------------------------------------------------------
+# Process-pool mode (--workers N)
+# --------------------------------------------------------------
+_worker_targets = {}
+
+def _init_worker(targets, spatial_order=False):
+    """
+    Pool initializer: each worker keeps the target frames and builds their
+    R-trees once. Under fork the frames (and any index already built in the
+    parent) are inherited copy-on-write instead of being pickled.
+    """
+    global SCORER_WORKERS, SPATIAL_ORDER
+    SCORER_WORKERS = 1
+    SPATIAL_ORDER = spatial_order
+    for key, target_proj in targets.items():
+        target_proj.sindex
+        _worker_targets[key] = target_proj
+
+def _match_chunk_task(key, chunk_prefix, chunk_no, yelp_chunk):
+    target_proj = _worker_targets[key]
+    chunk_file, elapsed = match_and_save_chunk(yelp_chunk, target_proj, target_proj.sindex, chunk_prefix, chunk_no)
+    return key, chunk_no, chunk_file, elapsed
+
+def run_matching_parallel(yelp_proj, targets, workers, resume=True):
+    """
+    targets: {key: (target_proj, chunk_prefix)}
+    Sends every (target, chunk) pair to one process pool, so OMF and Overpass
+    chunks run side by side. Chunk files are collected and concatenated in
+    chunk order regardless of completion order. Chunks already recorded in a
+    target's manifest are skipped.
+    Returns {key: (all_matched, chunk_files)}.
+    """
+    n = len(yelp_proj)
+    n_chunks = math.ceil(n / CHUNK_SIZE)
+    for target_proj, _ in targets.values():
+        target_proj.sindex  # build before forking so workers inherit it
+
+    chunk_files = {key: [None] * n_chunks for key in targets}
+    manifests = {
+        key: load_manifest(chunk_prefix) if resume else {"chunks": {}}
+        for key, (_, chunk_prefix) in targets.items()
+    }
+    pending = []
+    for key, (target_proj, chunk_prefix) in targets.items():
+        for chunk_no, start, end in chunk_bounds(n):
+            done = completed_chunk_file(manifests[key], yelp_proj, target_proj, chunk_no, start, end)
+            if done is not None:
+                print(f"[{key}] skipping chunk {chunk_no}/{n_chunks}: already saved to {done}")
+                chunk_files[key][chunk_no - 1] = done
+            else:
+                pending.append((key, chunk_prefix, chunk_no, start, end))
+
+    frames = {key: target_proj for key, (target_proj, _) in targets.items()}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(frames, SPATIAL_ORDER)) as pool:
+        futures = {
+            pool.submit(_match_chunk_task, key, chunk_prefix, chunk_no, yelp_proj.iloc[start:end].copy()): (start, end)
+            for key, chunk_prefix, chunk_no, start, end in pending
+        }
+        for fut in as_completed(futures):
+            key, chunk_no, chunk_file, elapsed = fut.result()
+            start, end = futures[fut]
+            print(f"[{key}] chunk {chunk_no}/{n_chunks} processed in {elapsed:.1f}s -> {chunk_file}")
+            chunk_files[key][chunk_no - 1] = chunk_file
+            manifests[key]["chunks"][str(chunk_no)] = chunk_entry(yelp_proj, targets[key][0], start, end, chunk_file)
+            save_manifest(targets[key][1], manifests[key])
+
+    return {key: (concat_chunk_files(files), files) for key, files in chunk_files.items()}
 
-    print("\n=== MATCHING: Yelp -> Overpass ===")
-    overpass_matched_gdf, overpass_chunks = run_matching_all_chunks(yelp_proj, overpass_proj, overpass_index, OVERPASS_CHUNK_PREFIX)
-    overpass_matched_gdf.to_file(FINAL_OVERPASS_OUT, driver="GeoJSON")
-    print(f"Final Overpass matched saved to {FINAL_OVERPASS_OUT} ({FINAL_OVERPASS_OUT.stat().st_size/1024/1024:.2f} MB)")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match Yelp businesses to OMF and Overpass places.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Process-pool size; 1 runs chunks sequentially in this process")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore chunk manifests and recompute every chunk")
+    parser.add_argument("--export-geojson", action="store_true",
+                        help="Also write GeoJSON copies of the final matched files")
+    parser.add_argument("--spatial-order", action="store_true",
+                        help="Chunk Yelp rows in Hilbert-curve order and match each chunk against a local target index")
+    args = parser.parse_args()
+    resume = not args.no_resume
+    SPATIAL_ORDER = args.spatial_order
+
+    yelp_proj, omf_proj, overpass_proj = load_inputs()
+    # Chunks run in Hilbert order; final outputs are put back in Yelp order
+    yelp_run = spatially_ordered(yelp_proj) if SPATIAL_ORDER else yelp_proj
+
+    if args.workers > 1:
+        print(f"\n=== MATCHING: Yelp -> OMF + Overpass ({args.workers} workers) ===")
+        results = run_matching_parallel(yelp_run, {
+            "omf": (omf_proj, OMF_CHUNK_PREFIX),
+            "overpass": (overpass_proj, OVERPASS_CHUNK_PREFIX),
+        }, args.workers, resume=resume)
+        omf_matched_gdf, omf_chunks = results["omf"]
+        overpass_matched_gdf, overpass_chunks = results["overpass"]
+        if SPATIAL_ORDER:
+            omf_matched_gdf = restore_order(omf_matched_gdf)
+            overpass_matched_gdf = restore_order(overpass_matched_gdf)
+
+        write_interim(omf_matched_gdf, FINAL_OMF_OUT)
+        print(f"Final OMF matched saved to {FINAL_OMF_OUT} ({FINAL_OMF_OUT.stat().st_size/1024/1024:.2f} MB)")
+        write_interim(overpass_matched_gdf, FINAL_OVERPASS_OUT)
+        print(f"Final Overpass matched saved to {FINAL_OVERPASS_OUT} ({FINAL_OVERPASS_OUT.stat().st_size/1024/1024:.2f} MB)")
+    else:
+        print("\n=== MATCHING: Yelp -> OMF ===")
+        omf_matched_gdf, omf_chunks = run_matching_all_chunks(yelp_run, omf_proj, omf_proj.sindex, OMF_CHUNK_PREFIX, resume=resume)
+        if SPATIAL_ORDER:
+            omf_matched_gdf = restore_order(omf_matched_gdf)
+        write_interim(omf_matched_gdf, FINAL_OMF_OUT)
+        print(f"Final OMF matched saved to {FINAL_OMF_OUT} ({FINAL_OMF_OUT.stat().st_size/1024/1024:.2f} MB)")
+
+        print("\n=== MATCHING: Yelp -> Overpass ===")
+        overpass_matched_gdf, overpass_chunks = run_matching_all_chunks(yelp_run, overpass_proj, overpass_proj.sindex, OVERPASS_CHUNK_PREFIX, resume=resume)
+        if SPATIAL_ORDER:
+            overpass_matched_gdf = restore_order(overpass_matched_gdf)
+        write_interim(overpass_matched_gdf, FINAL_OVERPASS_OUT)
+        print(f"Final Overpass matched saved to {FINAL_OVERPASS_OUT} ({FINAL_OVERPASS_OUT.stat().st_size/1024/1024:.2f} MB)")
+
+    if args.export_geojson:
+        for final_out in [FINAL_OMF_OUT, FINAL_OVERPASS_OUT]:
+            print(f"Exported {export_geojson(final_out)}")
 
     print("\nAll matching complete.")
-
@@ -1,35 +1,46 @@
+import sys
 import geopandas as gpd
 from pathlib import Path
 import pandas as pd
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.interim_storage import glob_interim, read_interim, write_interim, export_geojson
+
+EXPORT_GEOJSON = "--export-geojson" in sys.argv
+
 # Paths
 interim_dir = Path('../data/interim')
 
 # ------------------------
 # Merge all OMF datasets
 # ------------------------
-omf_files = list(interim_dir.glob('omf_*_normalized.geojson'))
-omf_gdfs = [gpd.read_file(f) for f in omf_files]
+omf_files = glob_interim(interim_dir, 'omf_*_normalized')
+omf_gdfs = [read_interim(f) for f in omf_files]
 omf_all = gpd.GeoDataFrame(pd.concat(omf_gdfs, ignore_index=True))
 
 # Optional: standardize CRS
 omf_all = omf_all.to_crs(epsg=4326)
 
 # Save merged OMF dataset
-omf_all.to_file(interim_dir / 'omf_all_merged.geojson', driver='GeoJSON')
-print(f"Merged {len(omf_files)} OMF files → omf_all_merged.geojson")
+omf_out = write_interim(omf_all, interim_dir / 'omf_all_merged')
+print(f"Merged {len(omf_files)} OMF files → {omf_out.name}")
+if EXPORT_GEOJSON:
+    print(f"Exported {export_geojson(omf_out)}")
 
 # ------------------------
 # Merge all Overpass datasets
 # ------------------------
-overpass_files = list(interim_dir.glob('overpass_*_normalized.geojson'))
-overpass_gdfs = [gpd.read_file(f) for f in overpass_files]
+overpass_files = glob_interim(interim_dir, 'overpass_*_normalized')
+overpass_gdfs = [read_interim(f) for f in overpass_files]
 overpass_all = gpd.GeoDataFrame(pd.concat(overpass_gdfs, ignore_index=True))
 
 # Optional: standardize CRS
 overpass_all = overpass_all.to_crs(epsg=4326)
 
 # Save merged Overpass dataset
-overpass_all.to_file(interim_dir / 'overpass_all_merged.geojson', driver='GeoJSON')
-print(f"Merged {len(overpass_files)} Overpass files → overpass_all_merged.geojson")
-
+overpass_out = write_interim(overpass_all, interim_dir / 'overpass_all_merged')
+print(f"Merged {len(overpass_files)} Overpass files → {overpass_out.name}")
+if EXPORT_GEOJSON:
+    print(f"Exported {export_geojson(overpass_out)}")
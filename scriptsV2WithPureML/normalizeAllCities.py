@@ -0,0 +1,229 @@
+import argparse
+import fnmatch
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.data_preprocessing.normalize_omf import normalize_omf_geojson
+from src.utils.interim_storage import EXTENSIONS, interim_path
+from csv_to_geojson import csv_to_geojson
+from normalizeAllOverpass import normalize_overpass_geojson
+
+# Directories (relative to the scripts/ directory, like the per-source scripts)
+RAW_DIR = Path('../data/raw')
+RAW_GEOJSON_DIR = Path('../data/raw_geojson')
+INTERIM_DIR = Path('../data/interim')
+
+WORKERS = os.cpu_count() or 1
+# Rough peak memory of one job: a fresh interpreter with geopandas loaded plus
+# a multiple of the input file (GeoJSON/CSV text expands a lot once parsed).
+JOB_OVERHEAD_MB = 300
+INPUT_GROWTH = 20
+
+# --------------------------------------------
+# STAGES
+# --------------------------------------------
+# Each stage maps files matching `pattern` in its `input_dirs` to one output
+# per city; on a city clash the later directory wins. Stages run in this
+# order; a city's OMF GeoJSON from "geojson" is picked up by "omf" in the
+# same run.
+STAGES = {
+    "geojson": {
+        "input_dirs": [RAW_DIR], "pattern": "omf_*.csv", "prefix": "omf_",
+        "output": lambda city: RAW_GEOJSON_DIR / f"omf_{city}.geojson",
+        "run": csv_to_geojson,
+    },
+    "omf": {
+        "input_dirs": [RAW_DIR, RAW_GEOJSON_DIR], "pattern": "omf_*.geojson", "prefix": "omf_",
+        "output": lambda city: interim_path(INTERIM_DIR / f"omf_{city}_normalized"),
+        "run": normalize_omf_geojson,
+    },
+    "overpass": {
+        "input_dirs": [RAW_DIR], "pattern": "overpass_*.geojson", "prefix": "overpass_",
+        "output": lambda city: interim_path(INTERIM_DIR / f"overpass_{city}_normalized"),
+        "run": normalize_overpass_geojson,
+    },
+}
+
+def city_of(path, prefix):
+    """'omf_santa_barbara_full.csv' -> 'santabarbara' (same key as 'overpass_santabarbara')"""
+    return Path(path).stem[len(prefix):].removesuffix("_full").replace("_", "")
+
+def discover(stage, produced=()):
+    """
+    {city: input path} for a stage: existing files plus outputs earlier stages
+    will write in this run. A city's file in a later input dir wins, and within
+    a dir its *_full file wins over its sample file.
+    """
+    spec = STAGES[stage]
+    rank = {d: i for i, d in enumerate(spec["input_dirs"])}
+    paths = {p for d in spec["input_dirs"] for p in d.glob(spec["pattern"])}
+    paths |= {p for p in produced if p.parent in rank and fnmatch.fnmatch(p.name, spec["pattern"])}
+    found = {}
+    for path in sorted(paths, key=lambda p: (rank[p.parent], p.stem.endswith("_full"), p.name)):
+        found[city_of(path, spec["prefix"])] = path
+    return dict(sorted(found.items()))
+
+def stale_outputs(stage, city):
+    """
+    Outputs of this stage written under another spelling of the city
+    (omf_santa_barbara_normalized.geojson vs omf_santabarbara_normalized.parquet),
+    in any interim format, which mergedatasets.py would otherwise pick up twice.
+    """
+    output = Path(STAGES[stage]["output"](city))
+    head, tail = Path(STAGES[stage]["output"]("*")).name.split("*")
+    tail = tail.removesuffix(output.suffix)
+    suffixes = EXTENSIONS.values() if output.parent == INTERIM_DIR else [output.suffix]
+    stale = []
+    for suffix in suffixes:
+        for p in output.parent.glob(f"{head}*{tail}{suffix}"):
+            spelling = p.name[len(head):len(p.name) - len(tail) - len(suffix)]
+            if spelling != city and spelling.replace("_", "") == city:
+                stale.append(p)
+    return sorted(stale)
+
+def remove_stale_outputs(jobs):
+    """Removes other spellings of every job's output; jobs whose output was not built are left alone."""
+    for job in jobs:
+        for stale in stale_outputs(job["stage"], job["city"]):
+            stale.unlink()
+            print(f"Removed {stale} (superseded by {job['output']})")
+
+def is_up_to_date(input_path, output_path):
+    """True when the output exists and is not older than its input."""
+    try:
+        return Path(output_path).stat().st_mtime >= Path(input_path).stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+def plan(stages, force=False):
+    """
+    Jobs for the selected stages in stage order. A job is skipped when its
+    output is up to date, unless forced or its input is rebuilt in this run.
+    """
+    jobs, skipped, producer = [], [], {}
+    for stage in stages:
+        for city, src in discover(stage, produced=producer).items():
+            dst = Path(STAGES[stage]["output"](city))
+            job = {"stage": stage, "city": city, "input": src, "output": dst, "after": producer.get(src)}
+            if not force and job["after"] is None and is_up_to_date(src, dst):
+                skipped.append(job)
+                continue
+            producer[dst] = len(jobs)
+            jobs.append(job)
+    return jobs, skipped
+
+def memory_budget_mb():
+    """Memory currently available to new processes (MemAvailable, else free pages)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES") // 2**20
+
+def estimate_mb(job):
+    return JOB_OVERHEAD_MB + INPUT_GROWTH * job["input"].stat().st_size / 2**20
+
+# --------------------------------------------
+# RUNNER
+# --------------------------------------------
+def run_job(stage, input_path, output_path):
+    """Runs one stage on one city in a worker; returns (output path, rows, seconds)."""
+    t0 = time.perf_counter()
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    gdf = STAGES[stage]["run"](str(input_path), str(output_path))
+    return str(output_path), len(gdf), time.perf_counter() - t0
+
+def run_jobs(jobs, workers=WORKERS, budget_mb=None):
+    """
+    Runs jobs in a process pool. A job starts once the job producing its input
+    has finished and its memory estimate fits in what running jobs leave of the
+    budget (a job that alone exceeds the budget still runs, by itself).
+    Returns {job index: (rows, seconds) or the exception}.
+    """
+    budget_mb = budget_mb or memory_budget_mb()
+    results, running, waiting = {}, {}, list(range(len(jobs)))
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        while waiting or running:
+            in_use = sum(mb for _, mb in running.values())
+            for i in list(waiting):
+                job = jobs[i]
+                after = job["after"]
+                if after is not None and after not in results:
+                    continue
+                if isinstance(results.get(after), Exception):
+                    waiting.remove(i)
+                    results[i] = RuntimeError(f"input {job['input']} was not built")
+                    continue
+                mb = estimate_mb(job)
+                if len(running) >= workers or (running and in_use + mb > budget_mb):
+                    break
+                waiting.remove(i)
+                print(f"Normalizing {job['input']} → {job['output']}")
+                running[pool.submit(run_job, job["stage"], job["input"], job["output"])] = (i, mb)
+                in_use += mb
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, _ = running.pop(future)
+                try:
+                    _, rows, secs = future.result()
+                    results[i] = (rows, secs)
+                except Exception as e:
+                    results[i] = e
+    return results
+
+def print_report(stages, jobs, skipped, results, wall):
+    print("\n=== Normalization Summary ===")
+    seen = {job["stage"] for job in jobs + skipped}
+    for stage in stages:
+        if stage not in seen:
+            spec = STAGES[stage]
+            dirs = ", ".join(str(d) for d in spec["input_dirs"])
+            print(f"  WARNING: {stage} found no {spec['pattern']} inputs in {dirs}")
+    for job in skipped:
+        print(f"  {job['stage']:<9} {job['city']:<16} up to date")
+    for i, job in enumerate(jobs):
+        res = results.get(i)
+        if isinstance(res, Exception):
+            print(f"  {job['stage']:<9} {job['city']:<16} FAILED: {res}")
+        else:
+            rows, secs = res
+            print(f"  {job['stage']:<9} {job['city']:<16} {rows} rows in {secs:.1f}s")
+    print(f"  wall: {wall:.1f}s")
+
+def main(stages=None):
+    parser = argparse.ArgumentParser(description="Normalize every city's OMF and Overpass files in parallel.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=stages or list(STAGES),
+                        help="Stages to run, in pipeline order (default: all)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Process-pool size")
+    parser.add_argument("--memory-mb", type=int, default=None,
+                        help="Memory budget for concurrent jobs (default: currently available memory)")
+    parser.add_argument("--force", action="store_true", help="Rebuild outputs even if they are up to date")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    stages = [s for s in STAGES if s in args.stages]
+    jobs, skipped = plan(stages, force=args.force)
+    results = run_jobs(jobs, workers=args.workers, budget_mb=args.memory_mb) if jobs else {}
+    remove_stale_outputs(skipped + [job for i, job in enumerate(jobs) if not isinstance(results.get(i), Exception)])
+    print_report(stages, jobs, skipped, results, time.perf_counter() - t0)
+
+    failed = sum(isinstance(r, Exception) for r in results.values())
+    if failed:
+        sys.exit(f"{failed} of {len(jobs)} normalization jobs failed.")
+    print("All city files normalized successfully.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,44 +2,48 @@ import sys
 from pathlib import Path
 import pandas as pd
 import numpy as np
-from unidecode import unidecode
 import geopandas as gpd
 
-def clean_text(x):
-    if pd.isnull(x) or str(x).strip() == "":
-        return np.nan
-    return unidecode(str(x).strip().lower())
-
-def get_id(row):
-    if isinstance(row, dict) and "@id" in row:
-        return row["@id"]
-    return None
-
-def get_name(row):
-    if isinstance(row, dict) and "name" in row:
-        return clean_text(row["name"])
-    return None
-
-def get_address(row):
-    if isinstance(row, dict):
-        if "addr:full" in row and row["addr:full"]:
-            return clean_text(row["addr:full"])
-        parts = []
-        for key in ["addr:housenumber", "addr:street", "addr:city", "addr:state", "addr:postcode"]:
-            if key in row and row[key]:
-                parts.append(str(row[key]))
-        if parts:
-            return clean_text(", ".join(parts))
-    return np.nan
-
-def get_category(row):
-    cats = []
-    keys = ["amenity", "shop", "office", "tourism", "craft", "service", "building", "brand"]
-    if isinstance(row, dict):
-        for k in keys:
-            if row.get(k):
-                cats.append(clean_text(row[k]))
-    return cats
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.interim_storage import write_interim
+from src.utils.text_normalization import fold_text, normalize_column
+
+ADDRESS_KEYS = ["addr:housenumber", "addr:street", "addr:city", "addr:state", "addr:postcode"]
+CATEGORY_KEYS = ["amenity", "shop", "office", "tourism", "craft", "service", "building", "brand"]
+
+# --------------------------------------------
+# COLUMNAR EXTRACTION (one column per OSM key)
+# --------------------------------------------
+def prop(props, key):
+    """Property column as objects, missing and "" values as None (all None when no feature has the key)."""
+    if key not in props.columns:
+        return pd.Series(None, index=props.index, dtype=object)
+    col = props[key].astype(object)
+    return col.where(col.notna() & (col != ""), None)
+
+def get_address(props):
+    """addr:full when set, else the set addr:* parts joined with ", " (NaN when neither)."""
+    joined = np.full(len(props), None, dtype=object)
+    for key in ADDRESS_KEYS:
+        part = prop(props, key).to_numpy()
+        has = pd.notna(part)
+        both, first = has & pd.notna(joined), has & pd.isna(joined)
+        joined[both] = joined[both] + ", " + part[both].astype(str).astype(object)
+        joined[first] = part[first].astype(str)
+    full = prop(props, "addr:full")
+    return normalize_column(full.where(full.notna(), pd.Series(joined, index=props.index)), fold_text)
+
+def get_category(props):
+    """Cleaned values of the set CATEGORY_KEYS, in key order, as one list per feature."""
+    keys = [k for k in CATEGORY_KEYS if k in props.columns]
+    if not keys:
+        return pd.Series([[] for _ in range(len(props))], index=props.index, dtype=object)
+    raw = [prop(props, k) for k in keys]
+    have = np.column_stack([c.notna().to_numpy() for c in raw])
+    vals = np.column_stack([normalize_column(c, fold_text).to_numpy() for c in raw])
+    return pd.Series([list(v[m]) for v, m in zip(vals, have)], index=props.index, dtype=object)
 '''
 def normalize_overpass_geojson(input_file: str, output_file: str):
     gdf = gpd.read_file(input_file)
@@ -67,60 +71,37 @@ def normalize_overpass_geojson(input_file: str, output_file: str):
     print(f"Normalized Overpass data saved to {output_file}")
     return gdf
 '''
-import geopandas as gpd
-
 def normalize_overpass_geojson(input_file: str, output_file: str):
     # Read GeoJSON normally (ignore_invalid won't work)
     gdf = gpd.read_file(input_file)
 
-    # Filter out invalid geometries
-    gdf = gdf[gdf.geometry.notna()]  # Remove nulls
-    gdf = gdf[gdf.geometry.is_valid | gdf.geometry.is_empty]  # Keep only valid or empty
-
-    # Extract properties safely
+    # Properties as columns: GeoPandas usually flattens them already
     if "properties" in gdf.columns:
-        props = gdf["properties"]
+        props = pd.DataFrame(gdf["properties"].tolist(), index=gdf.index)
     else:
-        props = gdf.apply(lambda row: row.to_dict(), axis=1)
-
-    # Normalization logic
-    gdf["id"] = props.apply(get_id)
-    gdf["name"] = props.apply(get_name)
-    gdf["address"] = props.apply(get_address)
-    gdf["category"] = props.apply(get_category)
-
-    gdf = gdf[["id", "name", "address", "category", "geometry"]]
-    gdf.dropna(subset=["name", "geometry"], inplace=True)
-
-    gdf.to_file(output_file, driver="GeoJSON")
+        props = gdf
+
+    # One pass: drop null/invalid geometries and unnamed features before extracting the rest
+    geom = gdf.geometry
+    name = normalize_column(prop(props, "name"), fold_text)
+    keep = geom.notna() & (geom.is_valid | geom.is_empty) & name.notna()
+    props = props[keep]
+
+    gdf = gpd.GeoDataFrame({
+        "id": props["@id"] if "@id" in props.columns else None,
+        "name": name[keep],
+        "address": get_address(props),
+        "category": get_category(props),
+    }, geometry=geom[keep], crs=gdf.crs)
+
+    output_file = write_interim(gdf, output_file)
     print(f"Normalized Overpass data saved to {output_file}")
     return gdf
 
 
 if __name__ == "__main__":
-    # List of all 15 Overpass city files
-    overpass_files = [
-        '../data/raw/overpass_boise_full.geojson',
-        '../data/raw/overpass_edmonton_full.geojson',
-        '../data/raw/overpass_indianapolis_full.geojson',
-        '../data/raw/overpass_nashville_full.geojson',
-        '../data/raw/overpass_neworleans_full.geojson',
-        '../data/raw/overpass_philadelphia_full.geojson',
-        '../data/raw/overpass_pittsburgh_full.geojson',
-#        '../data/raw/overpass_santabarbara.geojson',
-        '../data/raw/overpass_stlouis_full.geojson',
-        '../data/raw/overpass_tampa_full.geojson',
-        '../data/raw/overpass_tucson_full.geojson'
-    ]
-
-    output_dir = Path('../data/interim')
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    for file in overpass_files:
-        city_name = Path(file).stem.replace('overpass_', '')
-        output_file = output_dir / f'overpass_{city_name}_normalized.geojson'
-        print(f"Normalizing {file} → {output_file}")
-        normalize_overpass_geojson(file, str(output_file))
-
-    print("All Overpass files normalized successfully.")
-
+    # Every ../data/raw/overpass_*.geojson (the _full file when a city has both)
+    # → ../data/interim/overpass_<city>_normalized, in parallel and skipping
+    # cities whose output is up to date (see normalizeAllCities.py)
+    from normalizeAllCities import main
+    main(stages=["overpass"])
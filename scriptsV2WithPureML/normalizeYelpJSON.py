@@ -1,29 +1,27 @@
+import sys
 from pathlib import Path
 import pandas as pd
-import numpy as np
-from unidecode import unidecode
 
-def clean_text(x):
-    if pd.isnull(x) or str(x).strip() == "":
-        return np.nan
-    return unidecode(str(x).strip().lower())
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-def normalize_yelp_json(input_file):
-    df = pd.read_json(input_file, lines=True)
+from src.utils.text_normalization import fold_text, normalize_column
+from src.utils.yelp_loader import load_yelp
 
+def normalize_yelp_json(input_file):
     key_fields = [
         "business_id", "name", "address", "city", "state",
         "postal_code", "latitude", "longitude","categories"
     ]
-    df = df[key_fields]
+    df = load_yelp(input_file, key_fields)
 
     text_columns = ["name", "address", "city", "state"]
     for col in text_columns:
-        df[col] = df[col].apply(clean_text)
+        df[col] = normalize_column(df[col], fold_text)
 
     df.dropna(subset=["name", "address"], inplace=True)
     df['categories'] = df['categories'].apply(
-        lambda x: [clean_text(c) for c in x.split(',')] if pd.notnull(x) else []
+        lambda x: [fold_text(c) for c in x.split(',')] if pd.notnull(x) else []
     )
 
     return df
@@ -1,33 +1,60 @@
+import argparse
 import csv
 import json
+import os
+import sys
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+from src.utils.normalized_sources import (
+    SCHEMA, conform_column, normalized_writer, to_json_text, typed_record, write_batch
+)
 
 INPUT = "../data/raw/OMF_ALL_COMBINED.csv"
-INPUT = "project_b_samples_2k.csv"
-OUTPUT = "NORMALIZED_SOURCES.csv"
+INPUT = "project_b_samples_2k.parquet"  # Overture parquet is read directly (nested or JSON-text columns)
+OUTPUT = "NORMALIZED_SOURCES.csv"  # a typed NORMALIZED_SOURCES.parquet is written next to it
 
-# --------------------------------------------
-# PARSING STATISTICS
-# --------------------------------------------
-parse_attempts = 0
-parse_failures = 0
-total_raw_records = 0
-normalized_records = 0
+BATCH_ROWS = 2000  # OMF rows per batch: bounds memory and is the unit of work for the pool
+WORKERS = os.cpu_count() or 1
+
+HEADER = [
+    "place_id", "source", "record_id", "update_time", "name",
+    "categories", "phone", "website", "socials", "address", "confidence"
+]
+# OMF columns the normalizer reads (parquet input is projected to these)
+INPUT_COLUMNS = ["id", "sources", "names", "categories", "websites", "socials", "phones", "addresses", "confidence"]
+INPUT_COLUMNS += [f"base_{c}" for c in INPUT_COLUMNS[1:]]
+# NORMALIZED_SOURCES attribute column -> OMF column
+ATTRIBUTE_COLUMNS = {"categories": "categories", "phone": "phones", "website": "websites",
+                     "socials": "socials", "address": "addresses"}
 
 # --------------------------------------------
 # HELPERS
 # --------------------------------------------
-def safe_json(val):
-    """Safe JSON loader that tracks parsing attempts & failures."""
-    global parse_attempts, parse_failures
+def safe_json(val, stats):
+    """Safe JSON loader that tracks parsing attempts & failures in stats."""
     if not val or val.strip() == "":
         return None
-    parse_attempts += 1
+    stats["parse_attempts"] += 1
+    try:
+        return orjson.loads(val)
+    except orjson.JSONDecodeError:
+        pass
+    # orjson is stricter than json (NaN/Infinity, >64-bit ints); only count a failure if both reject it
     try:
         return json.loads(val)
     except Exception:
-        parse_failures += 1
+        stats["parse_failures"] += 1
         return None
 
 def stringify(x):
@@ -36,36 +63,43 @@ def stringify(x):
         return ""
     return f"=\"{str(x)}\""
 
+def output_rows(place_id, dataset, record_id, update_time, name, cat, phone, web, socials, addr, conf):
+    """One normalized record as (CSV row with JSON text, typed row for the Parquet copy)."""
+    csv_row = [
+        place_id, dataset, record_id, update_time, name,
+        json.dumps(cat) if cat else "",
+        json.dumps(phone) if phone else "",
+        json.dumps(web) if web else "",
+        json.dumps(socials) if socials else "",
+        json.dumps(addr) if addr else "",
+        conf
+    ]
+    return csv_row, typed_record(place_id, dataset, record_id, update_time, name, cat, phone, web, socials, addr, conf)
+
 # --------------------------------------------
-# MAIN NORMALIZATION PROCESS
+# BATCH NORMALIZATION (runs in the worker pool)
 # --------------------------------------------
-with open(INPUT, encoding="utf-8") as fin, open(OUTPUT, "w", newline="", encoding="utf-8") as fout:
-    reader = csv.DictReader(fin)
-    writer = csv.writer(fout)
-
-    # Output schema
-    writer.writerow([
-        "place_id", "source", "record_id", "update_time", "name",
-        "categories", "phone", "website", "socials", "address", "confidence"
-    ])
-
-    # ----------------------------------------
-    # PROCESS EACH OMF ROW
-    # ----------------------------------------
-    for row in reader:
-        total_raw_records += 1
+def normalize_batch(rows):
+    """Normalizes a batch of OMF rows; returns (csv_rows, typed_rows, stats)."""
+    if isinstance(rows, pa.RecordBatch):
+        return normalize_arrow_batch(rows)
+    stats = Counter()
+    out = []
+
+    for row in rows:
+        stats["raw_records"] += 1
         rows_written_for_this_place = 0
 
         place_id = row["id"]
 
         # Extract fields
-        sources = safe_json(row["sources"])
-        name = safe_json(row["names"])
-        cat = safe_json(row["categories"])
-        web = safe_json(row["websites"])
-        socials = safe_json(row["socials"])
-        phone = safe_json(row["phones"])
-        addr = safe_json(row["addresses"])
+        sources = safe_json(row["sources"], stats)
+        name = safe_json(row["names"], stats)
+        cat = safe_json(row["categories"], stats)
+        web = safe_json(row["websites"], stats)
+        socials = safe_json(row["socials"], stats)
+        phone = safe_json(row["phones"], stats)
+        addr = safe_json(row["addresses"], stats)
         conf = row["confidence"]
 
         # =====================================================
@@ -74,81 +108,247 @@ with open(INPUT, encoding="utf-8") as fin, open(OUTPUT, "w", newline="", encodin
         if isinstance(sources, list):
             for item in sources:
                 dataset = item.get("dataset", "").lower()
-                writer.writerow([
+                out.append(output_rows(
                     place_id,
                     dataset,
                     stringify(item.get("record_id")),
                     item.get("update_time", ""),
                     name.get("primary") if isinstance(name, dict) else "",
-                    json.dumps(cat) if cat else "",
-                    json.dumps(phone) if phone else "",
-                    json.dumps(web) if web else "",
-                    json.dumps(socials) if socials else "",
-                    json.dumps(addr) if addr else "",
+                    cat, phone, web, socials, addr,
                     item.get("confidence", conf)
-                ])
+                ))
                 rows_written_for_this_place += 1
 
         # =====================================================
         # UNIVERSAL HANDLER FOR STRUCTURED DATA (base_*)
         # =====================================================
-        struct_sources = safe_json(row["base_sources"])
-        struct_name = safe_json(row["base_names"])
-        struct_cat = safe_json(row["base_categories"])
-        struct_web = safe_json(row["base_websites"])
-        struct_socials = safe_json(row["base_socials"])
-        struct_phone = safe_json(row["base_phones"])
-        struct_addr = safe_json(row["base_addresses"])
+        struct_sources = safe_json(row["base_sources"], stats)
+        struct_name = safe_json(row["base_names"], stats)
+        struct_cat = safe_json(row["base_categories"], stats)
+        struct_web = safe_json(row["base_websites"], stats)
+        struct_socials = safe_json(row["base_socials"], stats)
+        struct_phone = safe_json(row["base_phones"], stats)
+        struct_addr = safe_json(row["base_addresses"], stats)
         struct_conf = row["base_confidence"]
 
         if isinstance(struct_sources, list) and len(struct_sources) > 0:
             struct = struct_sources[0]
             dataset = struct.get("dataset", "structured").lower()
-            writer.writerow([
+            out.append(output_rows(
                 place_id,
                 f"{dataset}_structured",
                 stringify(struct.get("record_id")),
                 struct.get("update_time", ""),
                 struct_name.get("primary") if isinstance(struct_name, dict) else "",
-                json.dumps(struct_cat) if struct_cat else "",
-                json.dumps(struct_phone) if struct_phone else "",
-                json.dumps(struct_web) if struct_web else "",
-                json.dumps(struct_socials) if struct_socials else "",
-                json.dumps(struct_addr) if struct_addr else "",
+                struct_cat, struct_phone, struct_web, struct_socials, struct_addr,
                 struct_conf
-            ])
+            ))
             rows_written_for_this_place += 1
 
         # =====================================================
         # ENSURE COVERAGE
         # =====================================================
         if rows_written_for_this_place == 0:
-            writer.writerow([
-                place_id, "missing_all_data", "", "", "", "", "", "", "", "", ""
-            ])
+            out.append(output_rows(place_id, "missing_all_data", "", "", "", None, None, None, None, None, ""))
+
+        stats["normalized_records"] += 1
 
-        normalized_records += 1
+    return [r[0] for r in out], [r[1] for r in out], stats
 
 # --------------------------------------------
-# PRINT SUMMARY
+# NESTED OVERTURE PARQUET (columnar, no JSON)
 # --------------------------------------------
-coverage = (normalized_records / total_raw_records) * 100
-error_rate = (parse_failures / parse_attempts * 100) if parse_attempts else 0
-
-print("=== NORMALIZATION STATS ===")
-print("Input OMF records:", total_raw_records)
-print("Normalized records produced:", normalized_records)
-print(f"Normalization coverage: {coverage:.2f}%")
-print()
-
-print("=== PARSING STATS ===")
-print("Total parse attempts:", parse_attempts)
-print("Total parse failures:", parse_failures)
-print(f"Parsing error rate: {error_rate:.2f}%")
-print()
-
-if error_rate < 1.0:
-    print("Parsing error rate acceptable (<1%)")
-else:
-    print("WARNING: High parsing error rate!")
+def is_nested(schema):
+    """True for Overture parquet with real list/struct columns, False for JSON-text columns."""
+    return pa.types.is_list(schema.field("sources").type)
+
+def struct_values(structs, name, default=None, typ=pa.string()):
+    """structs.<name> cast to typ; default is used only when the struct type has no such field."""
+    if structs.type.get_field_index(name) < 0:
+        return pa.array([default] * len(structs), typ)
+    return pc.struct_field(structs, name).cast(typ)
+
+def stringify_array(ids):
+    """stringify() over an array: '="id"', or "" for nulls."""
+    return pc.fill_null(pc.binary_join_element_wise('="', ids, '"', ""), "")
+
+def place_side(batch, prefix):
+    """Per-place (name, conformed attribute columns, confidence) for the release ("") or base ("base_") side."""
+    names = batch.column(prefix + "names")
+    primary = struct_values(names, "primary") if pa.types.is_struct(names.type) else pa.nulls(len(names), pa.string())
+    name = pc.if_else(names.is_valid(), primary, "")
+    attrs = {out: conform_column(batch.column(prefix + src), out) for out, src in ATTRIBUTE_COLUMNS.items()}
+    return name, attrs, batch.column(prefix + "confidence").cast(pa.float64())
+
+def record_part(kind, idx, place_id, source, record_id, update_time, side, confidence):
+    """Output rows for places idx as a table, keyed by (_place, _kind) for the final ordering."""
+    name, attrs, _ = side
+    cols = {"_place": idx, "_kind": pa.array(np.full(len(idx), kind, np.int8)),
+            "place_id": pc.take(place_id, idx), "source": source, "record_id": record_id,
+            "update_time": update_time, "name": pc.take(name, idx)}
+    cols.update({out: pc.take(arr, idx) for out, arr in attrs.items()})
+    cols["confidence"] = confidence
+    return pa.table(cols).select(["_place", "_kind", *SCHEMA.names]).cast(
+        pa.schema([pa.field("_place", pa.int64()), pa.field("_kind", pa.int8()), *SCHEMA]))
+
+def normalize_arrow_batch(batch):
+    """
+    normalize_batch for nested Overture batches. Sources are exploded through
+    their list offsets and the base side takes base_sources[0], all with Arrow
+    compute; output rows keep the per-place order of the row-wise path
+    (sources..., structured, missing_all_data).
+    """
+    n = batch.num_rows
+    place_id = batch.column("id").cast(pa.string())
+    main, base = place_side(batch, ""), place_side(batch, "base_")
+    parts = []
+
+    # UNIVERSAL HANDLER FOR ALL DATASETS IN "sources"
+    sources = batch.column("sources")
+    parent = pc.list_parent_indices(sources)
+    items = pc.list_flatten(sources)
+    if items.type.get_field_index("confidence") >= 0:
+        # item.get("confidence", conf): Arrow has no absent keys, so a null item confidence falls back too
+        conf = pc.coalesce(struct_values(items, "confidence", typ=pa.float64()), pc.take(main[2], parent))
+    else:
+        conf = pc.take(main[2], parent)
+    parts.append(record_part(
+        0, parent, place_id,
+        pc.utf8_lower(pc.fill_null(struct_values(items, "dataset", ""), "")),
+        stringify_array(struct_values(items, "record_id")),
+        struct_values(items, "update_time", ""),
+        main, conf
+    ))
+
+    # UNIVERSAL HANDLER FOR STRUCTURED DATA (base_*)
+    base_sources = batch.column("base_sources")
+    has_base = pc.fill_null(pc.greater(pc.list_value_length(base_sources), 0), False)
+    bidx = pc.indices_nonzero(has_base)
+    first = pc.list_element(pc.take(base_sources, bidx), 0)
+    dataset = pc.utf8_lower(pc.fill_null(struct_values(first, "dataset", "structured"), "structured"))
+    parts.append(record_part(
+        1, bidx, place_id,
+        pc.binary_join_element_wise(dataset, "_structured", ""),
+        stringify_array(struct_values(first, "record_id")),
+        struct_values(first, "update_time", ""),
+        base, pc.take(base[2], bidx)
+    ))
+
+    # ENSURE COVERAGE
+    has_sources = pc.fill_null(pc.greater(pc.list_value_length(sources), 0), False)
+    midx = pc.indices_nonzero(pc.invert(pc.or_(has_sources, has_base)))
+    m = len(midx)
+    blank = (pa.array([""] * n), {out: pa.nulls(n, SCHEMA.field(out).type) for out in ATTRIBUTE_COLUMNS}, None)
+    parts.append(record_part(
+        2, midx, place_id,
+        pa.array(["missing_all_data"] * m), pa.array([""] * m), pa.array([""] * m),
+        blank, pa.nulls(m, pa.float64())
+    ))
+
+    table = pa.concat_tables(parts)
+    order = pc.sort_indices(table, sort_keys=[("_place", "ascending"), ("_kind", "ascending")])  # stable
+    table = table.take(order).drop_columns(["_place", "_kind"])
+
+    # CSV export keeps the JSON text columns
+    cols = {c: table.column(c).to_pylist() for c in SCHEMA.names}
+    for c in ATTRIBUTE_COLUMNS:
+        cols[c] = [to_json_text(v) for v in cols[c]]
+    csv_rows = [["" if v is None else v for v in row] for row in zip(*(cols[c] for c in SCHEMA.names))]
+
+    stats = Counter(raw_records=n, normalized_records=n)
+    return csv_rows, table, stats
+
+# --------------------------------------------
+# STREAMING INPUT / PARALLEL EXECUTION
+# --------------------------------------------
+def iter_batches(path, batch_rows=BATCH_ROWS):
+    """
+    Yields OMF batches BATCH_ROWS at a time: Arrow record batches for nested
+    Overture parquet, otherwise lists of row dicts from a CSV or JSON-text
+    parquet (values as the strings the CSV export would hold, "" for nulls).
+    """
+    if Path(path).suffix == ".parquet":
+        pf = pq.ParquetFile(path)
+        nested = is_nested(pf.schema_arrow)
+        for batch in pf.iter_batches(batch_size=batch_rows, columns=INPUT_COLUMNS):
+            if nested:
+                yield batch
+            else:
+                yield [{k: "" if v is None else str(v) for k, v in row.items()} for row in batch.to_pylist()]
+        return
+
+    with open(path, encoding="utf-8") as fin:
+        reader = csv.DictReader(fin)
+        while batch := list(islice(reader, batch_rows)):
+            yield batch
+
+def run_batches(batches, workers=WORKERS):
+    """normalize_batch over batches in input order, keeping at most 2 * workers batches in flight."""
+    if workers <= 1:
+        yield from map(normalize_batch, batches)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(normalize_batch, batch))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def error_rate(stats):
+    return (stats["parse_failures"] / stats["parse_attempts"] * 100) if stats["parse_attempts"] else 0
+
+# --------------------------------------------
+# MAIN NORMALIZATION PROCESS
+# --------------------------------------------
+def normalize(input_path=INPUT, output=OUTPUT, workers=WORKERS, batch_rows=BATCH_ROWS):
+    """Streams input_path through the pool, appending each batch to OUTPUT (CSV) and its Parquet copy."""
+    totals = Counter()
+    with open(output, "w", newline="", encoding="utf-8") as fout, normalized_writer(output) as typed_out:
+        writer = csv.writer(fout)
+
+        # Output schema
+        writer.writerow(HEADER)
+
+        for i, (csv_rows, typed_rows, stats) in enumerate(run_batches(iter_batches(input_path, batch_rows), workers), 1):
+            writer.writerows(csv_rows)
+            write_batch(typed_out, typed_rows)
+            totals.update(stats)
+            print(f"Batch {i}: {stats['raw_records']} OMF records -> {len(csv_rows)} rows | "
+                  f"{stats['parse_attempts']} parses, {stats['parse_failures']} failures ({error_rate(stats):.2f}%)")
+
+    print(f"Wrote {output} and {Path(output).with_suffix('.parquet')}")
+    return totals
+
+def print_summary(totals):
+    coverage = (totals["normalized_records"] / totals["raw_records"] * 100) if totals["raw_records"] else 0
+    rate = error_rate(totals)
+
+    print("=== NORMALIZATION STATS ===")
+    print("Input OMF records:", totals["raw_records"])
+    print("Normalized records produced:", totals["normalized_records"])
+    print(f"Normalization coverage: {coverage:.2f}%")
+    print()
+
+    print("=== PARSING STATS ===")
+    print("Total parse attempts:", totals["parse_attempts"])
+    print("Total parse failures:", totals["parse_failures"])
+    print(f"Parsing error rate: {rate:.2f}%")
+    print()
+
+    if rate < 1.0:
+        print("Parsing error rate acceptable (<1%)")
+    else:
+        print("WARNING: High parsing error rate!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize OMF places into one row per source record.")
+    parser.add_argument("--input", default=INPUT, help="OMF CSV or parquet (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="parsing processes; 1 runs in-process (default: %(default)s)")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS,
+                        help="OMF rows per batch (default: %(default)s)")
+    args = parser.parse_args()
 
+    print_summary(normalize(args.input, OUTPUT, args.workers, args.batch_rows))
@@ -1,16 +1,17 @@
+import sys
+from pathlib import Path
 import pandas as pd
 import json
 import re
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.text_normalization import scrub_text
+
 INPUT = "NORMALIZED_SOURCES_SAMPLE_200.csv"
 OUTPUT = "NORMALIZED_SOURCES.csv"
 
-def clean_text(x):
-    if not x: return ""
-    x = str(x).lower()
-    x = re.sub(r"[^a-z0-9 ]", " ", x)
-    return re.sub(r"\s+", " ", x).strip()
-
 def clean_phone(p):
     if not p: return ""
     p = re.sub(r"\D", "", str(p))
@@ -25,7 +26,7 @@ def to_json_list(x):
 def parse_address(addr_str):
     # Split your address string roughly into street/city/state/postal if possible
     # Here we just use full address as street and leave others blank
-    full = clean_text(addr_str)
+    full = scrub_text(addr_str)
     return full, full, "", "", "", ""
 
 df = pd.read_csv(INPUT)
@@ -36,7 +37,7 @@ for _, row in df.iterrows():
     normalized.append({
         "place_id": row["id"],
         "source": row["source_file"] if "source_file" in row else "omf",
-        "name": clean_text(row["name"]),
+        "name": scrub_text(row["name"]),
         "phone": clean_phone(row["phones"]),
         "addr": full_addr,
         "street": street,
@@ -1,107 +1,129 @@
 #!/usr/bin/env python3
+import argparse
+import shutil
+import sys
+import numpy as np
 import pandas as pd
-import geopandas as gpd
 from pathlib import Path
 
-# Paths
-YELP_OMF_FILE = "../data/interim/yelp_omf_matched.geojson"
-YELP_OVERPASS_FILE = "../data/interim/yelp_overpass_matched.geojson"
-OUT_FILE = "../data/processed/yelp_triplet_matches.csv"
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-# Ensure output folder exists
-Path("../data/processed").mkdir(exist_ok=True)
+from src.utils.interim_storage import find_interim, read_interim
 
-# --------------------------------------------------------------
-# Load matched datasets
-# --------------------------------------------------------------
-yelp_omf = gpd.read_file(YELP_OMF_FILE)
-yelp_overpass = gpd.read_file(YELP_OVERPASS_FILE)
+# Paths
+YELP_OMF_FILE = "../data/interim/yelp_omf_matched"
+YELP_OVERPASS_FILE = "../data/interim/yelp_overpass_matched"
 
-print("Loaded Yelp→OMF columns:", yelp_omf.columns)
-print("Loaded Yelp→Overpass columns:", yelp_overpass.columns)
+OMF_COLUMNS = [
+    "business_id", "name_left", "address_left", "latitude", "longitude",
+    "matched_id", "matched_name", "matched_name_score", "distance_m_final",
+    "categories", "category"
+]
+OVERPASS_COLUMNS = [
+    "business_id", "matched_id", "matched_name", "matched_name_score",
+    "distance_m_final", "category"
+]
+TRIPLET_COLUMNS = [
+    "place_id", "business_id",
+    "name", "address", "category", "latitude", "longitude",
+    "omf_id", "omf_name", "omf_category", "omf_score", "omf_distance",
+    "overpass_id", "overpass_name", "overpass_category", "overpass_score", "overpass_distance"
+]
+OUT_FILE = "../data/processed/yelp_triplet_matches.csv"
+# Parquet dataset, hive-partitioned by a hash bucket of place_id: every row of
+# a place lands in the same part, so per-place stages can read one part at a time
+OUT_DATASET = "../data/processed/yelp_triplet_matches"
+BUCKETS = 16
 
 # --------------------------------------------------------------
-# Select + rename columns for OMF matches
+# Load matched datasets (only the columns used below, no geometry)
 # --------------------------------------------------------------
-yelp_omf = yelp_omf[[
-    "business_id",
-    "name_left",
-    "address_left",
-    "latitude",
-    "longitude",
-    "matched_id",
-    "matched_name",
-    "matched_name_score",
-    "distance_m_final",
-    "categories",
-    "category"
-]].rename(columns={
-    "name_left": "name",
-    "address_left": "address",
-    "matched_id": "omf_id",
-    "matched_name": "omf_name",
-    "matched_name_score": "omf_score",
-    "distance_m_final": "omf_distance",
-    "categories": "category",
-    "category": "omf_category"
-})
+def load_matches():
+    yelp_omf = read_interim(find_interim(YELP_OMF_FILE), columns=OMF_COLUMNS, geometry=False)
+    yelp_overpass = read_interim(find_interim(YELP_OVERPASS_FILE), columns=OVERPASS_COLUMNS, geometry=False)
 
-# --------------------------------------------------------------
-# Select + rename columns for Overpass matches
-# --------------------------------------------------------------
-yelp_overpass = yelp_overpass[[
-    "business_id",
-    "matched_id",
-    "matched_name",
-    "matched_name_score",
-    "distance_m_final",
-    "category"
-]].rename(columns={
-    "matched_id": "overpass_id",
-    "matched_name": "overpass_name",
-    "matched_name_score": "overpass_score",
-    "distance_m_final": "overpass_distance",
-    "category": "overpass_category"
-})
+    print("Loaded Yelp→OMF columns:", yelp_omf.columns)
+    print("Loaded Yelp→Overpass columns:", yelp_overpass.columns)
 
-# --------------------------------------------------------------
-# Merge OMF + Overpass into triplets (KEEP ALL YELP ROWS)
-# --------------------------------------------------------------
-triplet_df = pd.merge(yelp_omf, yelp_overpass, on="business_id", how="outer")
+    # Select + rename columns for OMF matches
+    yelp_omf = yelp_omf[OMF_COLUMNS].rename(columns={
+        "name_left": "name",
+        "address_left": "address",
+        "matched_id": "omf_id",
+        "matched_name": "omf_name",
+        "matched_name_score": "omf_score",
+        "distance_m_final": "omf_distance",
+        "categories": "category",
+        "category": "omf_category"
+    })
 
-# --------------------------------------------------------------
-# DO NOT REMOVE YELP-ONLY ROWS (critical)
-# --------------------------------------------------------------
-# triplet_df = triplet_df[...]  <-- REMOVED
+    # Select + rename columns for Overpass matches
+    yelp_overpass = yelp_overpass[OVERPASS_COLUMNS].rename(columns={
+        "matched_id": "overpass_id",
+        "matched_name": "overpass_name",
+        "matched_name_score": "overpass_score",
+        "distance_m_final": "overpass_distance",
+        "category": "overpass_category"
+    })
+    return yelp_omf, yelp_overpass
 
 # --------------------------------------------------------------
 # Assign unified place_id
 # --------------------------------------------------------------
-def assign_place_id(row):
-    if pd.notnull(row["omf_id"]):
-        return f"P_{row['omf_id']}"
-    elif pd.notnull(row["overpass_id"]):
-        return f"P_{row['overpass_id']}"
-    else:
-        return f"P_{row['business_id']}"
+def assign_place_ids(df):
+    """
+    "P_" + the first present of omf_id, overpass_id, business_id, for all
+    rows at once (np.select over the notna masks).
+    """
+    omf, overpass, business = (df[c].to_numpy(dtype=object) for c in ("omf_id", "overpass_id", "business_id"))
+    source = np.select([pd.notna(omf), pd.notna(overpass)], [omf, overpass], default=business)
+    return pd.Series(["P_" + str(s) for s in source], index=df.index, dtype=object)
 
-triplet_df["place_id"] = triplet_df.apply(assign_place_id, axis=1)
+def build_triplets(yelp_omf, yelp_overpass):
+    # Merge OMF + Overpass into triplets (KEEP ALL YELP ROWS)
+    triplet_df = pd.merge(yelp_omf, yelp_overpass, on="business_id", how="outer")
 
-# --------------------------------------------------------------
-# Reorder columns
-# --------------------------------------------------------------
-triplet_df = triplet_df[[
-    "place_id", "business_id",
-    "name", "address", "category", "latitude", "longitude",
-    "omf_id", "omf_name", "omf_category", "omf_score", "omf_distance",
-    "overpass_id", "overpass_name", "overpass_category", "overpass_score", "overpass_distance"
-]]
+    # DO NOT REMOVE YELP-ONLY ROWS (critical)
+    # triplet_df = triplet_df[...]  <-- REMOVED
+
+    triplet_df["place_id"] = assign_place_ids(triplet_df)
+    return triplet_df[TRIPLET_COLUMNS]
 
 # --------------------------------------------------------------
 # Save
 # --------------------------------------------------------------
-triplet_df.to_csv(OUT_FILE, index=False)
-print(f"\nTriplet table saved: {OUT_FILE}")
-print(f"Total rows: {len(triplet_df):,}")
-print("Finished!")
+def place_buckets(place_ids, buckets=BUCKETS):
+    """Stable (run-independent) hash bucket per place_id."""
+    return (pd.util.hash_array(place_ids.to_numpy(dtype=object)) % np.uint64(buckets)).astype(np.int16)
+
+def write_triplet_dataset(triplet_df, path=OUT_DATASET, buckets=BUCKETS):
+    """Rewrites the partitioned Parquet copy of the triplet table (bucket=<k>/ parts)."""
+    path = Path(path)
+    if path.exists():
+        shutil.rmtree(path)
+    triplet_df.assign(bucket=place_buckets(triplet_df["place_id"], buckets)).to_parquet(
+        path, partition_cols=["bucket"], index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign place_ids to Yelp/OMF/Overpass match triplets.")
+    parser.add_argument("--buckets", type=int, default=BUCKETS,
+                        help="place_id hash partitions in the Parquet dataset")
+    parser.add_argument("--no-csv", action="store_true",
+                        help=f"Only write the Parquet dataset, not {OUT_FILE}")
+    args = parser.parse_args()
+
+    # Ensure output folder exists
+    Path("../data/processed").mkdir(exist_ok=True)
+
+    triplet_df = build_triplets(*load_matches())
 
+    dataset = write_triplet_dataset(triplet_df, buckets=args.buckets)
+    print(f"\nTriplet dataset saved: {dataset} ({args.buckets} place_id buckets)")
+    if not args.no_csv:
+        triplet_df.to_csv(OUT_FILE, index=False)
+        print(f"Triplet table saved: {OUT_FILE}")
+    print(f"Total rows: {len(triplet_df):,}")
+    print("Finished!")
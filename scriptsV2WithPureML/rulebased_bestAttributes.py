@@ -1,13 +1,17 @@
 import pandas as pd
-import json, re
-from collections import Counter
+import json, re, sys
 from pathlib import Path
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.normalized_sources import find_normalized, read_normalized
+
 # --- CONFIGURATION ---
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 #INPUT_NORMALIZED = "NORMALIZED_SOURCES_SAMPLE_200.csv"
-INPUT_NORMALIZED = "NORMALIZED_SOURCES.csv"
+INPUT_NORMALIZED = "NORMALIZED_SOURCES"  # .parquet (typed) preferred, else .csv
 OUTPUT_BEST = Path(__file__).resolve().parent / "RULE_BEST_ATTRIBUTES.csv"
 
 # Lower rank = Better source
@@ -19,6 +23,7 @@ BAD_DOMAINS = ["facebook.com", "instagram.com", "youtube.com", "twitter.com", "y
 
 # --- HELPER FUNCTIONS ---
 def safe_json(val):
+    if isinstance(val, (list, dict)): return val  # already typed (Parquet input)
     try: return json.loads(str(val))
     except: return None
 
@@ -28,40 +33,52 @@ def get_rank(src):
 def clean_str(s): 
     return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", " ", str(s).lower())).strip()
 
+def map_object(col, func):
+    """col.map(func) kept as object dtype, so None results stay None instead of becoming NaN."""
+    return pd.Series([func(v) for v in col], index=col.index, dtype=object, name=col.name)
+
 def extract_domain(url):
     if not url: return ""
     u = str(url).lower().replace("https://", "").replace("http://", "").replace("www.", "")
     return u.split("/")[0].strip()
 
+def extract_domains(urls):
+    """extract_domain() over a Series of non-empty urls."""
+    u = urls.map(str).str.lower().str.replace("https://", "", regex=False)
+    u = u.str.replace("http://", "", regex=False).str.replace("www.", "", regex=False)
+    return u.str.split("/", n=1).str[0].str.strip()
+
+def pick_best(cands, value, order=("rank",)):
+    """First candidate per place_id after a stable sort on `order`, as [value, source] indexed by place_id.
+
+    Ties keep input row order, matching the old per-group "first best" picks.
+    """
+    best = cands.sort_values(["place_id", *order], kind="stable").drop_duplicates("place_id")
+    return best.set_index("place_id")[[value, "source"]]
+
 # --- ATTRIBUTE RULES ---
+# Each rule runs over the whole frame (one row per source record, with an integer
+# "rank" column) and returns the winning [value, source] per place_id.
 
 def rule_name(df):
     """Pick name based on Source Priority. (Simple & effective for clean sources)"""
     # Sort by source rank, return the first non-empty name
-    candidates = df[df["name"].notna() & (df["name"] != "")].copy()
-    if candidates.empty: return "", ""
-    
-    candidates["rank"] = candidates["source"].apply(get_rank)
-    best = candidates.sort_values("rank").iloc[0]
-    return best["name"], best["source"]
+    candidates = df[df["name"].notna() & (df["name"] != "")]
+    return pick_best(candidates, "name")
 
 def rule_phone(df):
     """Extract digits. Majority vote. Tie-break by Source Rank."""
-    candidates = []
-    for idx, row in df.iterrows():
-        digits = re.sub(r"\D", "", str(row.get("phone", "")))
-        if len(digits) >= 10: candidates.append((digits[-10:], idx)) # Keep last 10
-    
-    if not candidates: return "", ""
-    
-    # Majority Vote
-    counts = Counter(c[0] for c in candidates)
-    best_num = max(counts, key=counts.get) # Get most frequent number
-    
-    # Find source of that number with best rank
-    matching_rows = [idx for num, idx in candidates if num == best_num]
-    best_idx = min(matching_rows, key=lambda i: get_rank(df.loc[i, "source"]))
-    return best_num, df.loc[best_idx, "source"]
+    digits = df["phone"].map(str).str.replace(r"\D", "", regex=True)
+    candidates = df.loc[digits.str.len() >= 10, ["place_id", "source", "rank"]]
+    candidates["phone"] = digits.str[-10:] # Keep last 10
+
+    # Majority Vote: most frequent number first, ties go to the number seen first,
+    # then the best-ranked record carrying it
+    by_num = candidates.groupby(["place_id", "phone"], sort=False)["rank"]
+    candidates["votes"] = -by_num.transform("size")
+    candidates["seen"] = candidates.index  # frame is in input order with a RangeIndex
+    candidates["seen"] = candidates.groupby(["place_id", "phone"], sort=False)["seen"].transform("min")
+    return pick_best(candidates, "phone", order=("votes", "seen", "rank"))
 '''
 def rule_address(df):
     """Parse JSON. Pick longest valid address from highest priority source."""
@@ -87,75 +104,77 @@ def rule_address(df):
     return nice_str, df.loc[best_idx, "source"]
 '''
 
+def address_text(raw):
+    """First address block as "freeform locality region postcode", cleaned like the flattened addr column."""
+    data = safe_json(raw)
+    if not data or not isinstance(data, list) or not isinstance(data[0], dict): return ""
+    a = data[0]
+    return clean_str(" ".join(str(a.get(k) or "") for k in ("freeform", "locality", "region", "postcode")))
+
 def rule_address(df):
     """Pick first non-empty address (already normalized)."""
+    if "addr" not in df.columns:
+        # normalize_omf.py output (Parquet or CSV): typed/JSON address list instead of a flat addr
+        df = df.assign(addr=map_object(df["address"], address_text))
     candidates = df[df["addr"].notna() & (df["addr"] != "")]
-    if candidates.empty: return "", ""
     # pick the first row (or by source rank if you like)
-    best = candidates.sort_values("source", key=lambda s: s.apply(get_rank)).iloc[0]
-    return best["addr"], best["source"]
+    return pick_best(candidates, "addr")
 
 def rule_website(df):
     """Pick non-social domain from best source."""
-    candidates = []
-    for idx, row in df.iterrows():
-        urls = safe_json(row.get("website"))
-        if not urls: continue
-        url_list = urls if isinstance(urls, list) else [urls]
-        for u in url_list:
-            if not u: continue
-            dom = extract_domain(u)
-            is_junk = any(bad in dom for bad in BAD_DOMAINS)
-            candidates.append((u, dom, is_junk, idx))
-            
-    if not candidates: return "", ""
-    
-    # Filter junk unless it's the only option
-    clean_cands = [c for c in candidates if not c[2]]
-    final_pool = clean_cands if clean_cands else candidates
-    
+    urls = map_object(df["website"], safe_json)
+    urls = map_object(urls, lambda u: [x for x in (u if isinstance(u, list) else [u]) if x] if u else [])
+    urls = urls[urls.map(len) > 0].explode()
+    candidates = df[["place_id", "source", "rank"]].join(urls, how="inner")
+
+    # Filter junk unless it's the only option for that place
+    bad = "|".join(re.escape(b) for b in BAD_DOMAINS)
+    candidates["junk"] = extract_domains(candidates["website"]).str.contains(bad, regex=True)
+    only_junk = candidates.groupby("place_id", sort=False)["junk"].transform("all")
+    candidates = candidates[~candidates["junk"] | only_junk]
+
     # Sort by Source Rank
-    best_tuple = sorted(final_pool, key=lambda x: get_rank(df.loc[x[3], "source"]))[0]
-    return best_tuple[0], df.loc[best_tuple[3], "source"]
+    return pick_best(candidates, "website")
+
+def category_value(raw):
+    cat = safe_json(raw)
+    return cat.get("primary") if isinstance(cat, dict) else str(cat)
 
 def rule_category(df):
     """Pick longest category string from best source."""
-    candidates = []
-    for idx, row in df.iterrows():
-        cat = safe_json(row.get("categories"))
-        val = cat.get("primary") if isinstance(cat, dict) else str(cat)
-        if val and val != "None": candidates.append((val, idx))
-            
-    if not candidates: return "", ""
+    vals = map_object(df["categories"], category_value)
+    keep = [bool(v) and v != "None" for v in vals]
+    candidates = df.loc[keep, ["place_id", "source", "rank"]].assign(category=vals[keep])
     # Sort by Rank (asc), then Length (desc) - assuming longer is more specific
-    best = sorted(candidates, key=lambda x: (get_rank(df.loc[x[1], "source"]), -len(x[0])))[0]
-    return best[0], df.loc[best[1], "source"]
+    candidates["length"] = -candidates["category"].map(len)
+    return pick_best(candidates, "category", order=("rank", "length"))
 
 # --- MAIN EXECUTION ---
+RULES = [("name", rule_name), ("phone", rule_phone), ("address", rule_address),
+         ("website", rule_website), ("category", rule_category)]
+
 def run_conflation():
-    df = pd.read_csv(INPUT_NORMALIZED)
-    results = []
-
-    for pid, group in df.groupby("place_id"):
-        b_name, src_name = rule_name(group)
-        b_phone, src_phone = rule_phone(group)
-        b_addr, src_addr = rule_address(group)
-        b_web, src_web = rule_website(group)
-        b_cat, src_cat = rule_category(group)
-
-        # Determine Best Source (Source that won the most fields)
-        srcs = [s for s in [src_name, src_phone, src_addr, src_web, src_cat] if s]
-        best_overall = max(set(srcs), key=srcs.count) if srcs else ""
-
-        results.append({
-            "place_id": pid,
-            "best_source": best_overall,
-            "best_name": b_name, "best_phone": b_phone,
-            "best_address": b_addr, "best_website": b_web, "best_category": b_cat
-        })
-
-    pd.DataFrame(results).to_csv(OUTPUT_BEST, index=False)
-    print(f"Done. Wrote {len(results)} rows to {OUTPUT_BEST}")
+    df = read_normalized(find_normalized(INPUT_NORMALIZED))
+    df = df[df["place_id"].notna()].reset_index(drop=True)
+    df["rank"] = df["source"].map(get_rank)  # computed once for every rule
+    places = pd.Index(df["place_id"].unique()).sort_values()
+
+    out = pd.DataFrame({"place_id": places})
+    srcs = []
+    for attr, rule in RULES:
+        best = rule(df).reindex(places, fill_value="")
+        out[f"best_{attr}"] = best.iloc[:, 0].to_numpy()
+        srcs.append(best["source"].to_numpy())
+
+    # Determine Best Source (Source that won the most fields)
+    best_source = []
+    for row in zip(*srcs):
+        row_srcs = [s for s in row if s]
+        best_source.append(max(set(row_srcs), key=row_srcs.count) if row_srcs else "")
+    out.insert(1, "best_source", best_source)
+
+    out.to_csv(OUTPUT_BEST, index=False)
+    print(f"Done. Wrote {len(out)} rows to {OUTPUT_BEST}")
 
 if __name__ == "__main__":
     run_conflation()
@@ -1,8 +1,15 @@
+import sys
+from pathlib import Path
 import pandas as pd
 import json
 from rapidfuzz import fuzz
 from sklearn.metrics import precision_score, recall_score, f1_score
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.text_normalization import alnum_text
+
 # ======================================================
 # CONFIGURATION
 # ======================================================
@@ -74,18 +81,12 @@ def clean_category(c):
         pass
     return str(c).lower()
 
-def clean_name(n):
-    if pd.isna(n): return ""
-    n = str(n).lower()
-    n = "".join(c if c.isalnum() or c==" " else " " for c in n)
-    return " ".join(n.split())
-
 def normalize(v, field):
     if field=="phone": return clean_phone(v)
     if field=="address": return clean_address(v)
     if field=="website": return clean_website(v)
     if field=="categories": return clean_category(v)
-    return clean_name(v)
+    return alnum_text(v)
 
 # ======================================================
 # MAIN EVALUATION
@@ -1,12 +1,20 @@
+import sys
+from pathlib import Path
 import pandas as pd
-from rapidfuzz import fuzz
 import json
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.evaluation import evaluate, write_mismatches
+from src.utils.text_normalization import alnum_text
+
 # =========================
 # CONFIG
 # =========================
 GOLD_FILE = "RULE_GOLDEN_DATASET.csv"      # Golden dataset
 PRED_FILE = "RULE_BEST_ATTRIBUTES.csv"    # Predictions
+MISMATCH_FILE = "RULE_EVAL_MISMATCHES.csv"  # Sampled mismatching pairs
 ATTRS = {
     "name":       ("truth_name", "best_name"),
     "phone":      ("truth_phone", "best_phone"),
@@ -23,12 +31,6 @@ def clean_phone(p):
     digits = "".join([d for d in str(p) if d.isdigit()])
     return digits[-10:]
 
-def clean_text(t):
-    if pd.isna(t): return ""
-    t = str(t).lower()
-    t = "".join(c if c.isalnum() or c==" " else " " for c in t)
-    return " ".join(t.split())
-
 def clean_website(w):
     if pd.isna(w): return ""
     w = str(w).lower()
@@ -36,10 +38,17 @@ def clean_website(w):
         w = w.replace(prefix, "")
     return w.split("/")[0]
 
+def as_json(v):
+    """json.loads for text; lists/dicts from typed (Parquet) columns are already parsed."""
+    return v if isinstance(v, (list, dict)) else json.loads(v)
+
+def is_missing(v):
+    return not isinstance(v, (list, dict)) and pd.isna(v)
+
 def clean_category(c):
-    if pd.isna(c): return ""
+    if is_missing(c): return ""
     try:
-        obj = json.loads(c)
+        obj = as_json(c)
         if isinstance(obj, list):
             return " ".join([str(x).lower() for x in obj])
         if isinstance(obj, dict):
@@ -48,17 +57,13 @@ def clean_category(c):
         return str(c).lower()
     return str(c).lower()
 
-def normalize(value, field):
-    if field == "phone": 
-        return clean_phone(value)
-    if field == "address": 
-        # Skip extra cleaning since addresses are already normalized
-        return str(value)
-    if field == "website": 
-        return clean_website(value)
-    if field == "categories": 
-        return clean_category(value)
-    return clean_text(value)
+NORMALIZERS = {
+    "name":       alnum_text,
+    "phone":      clean_phone,
+    "address":    str,  # Skip extra cleaning since addresses are already normalized
+    "categories": clean_category,
+    "website":    clean_website,
+}
 
 # =========================
 # MAIN EVALUATION
@@ -68,30 +73,9 @@ pred = pd.read_csv(PRED_FILE)
 
 merged = gold.merge(pred, on="place_id", how="inner")
 
-field_scores = {}
-for field, (truth_col, pred_col) in ATTRS.items():
-    correct = 0
-    total = 0
-    for _, r in merged.iterrows():
-        t = normalize(r[truth_col], field)
-        p = normalize(r.get(pred_col, ""), field)
-
-        # Debug output for address
-        if field == "address":
-            print(f"Truth   : '{t}'")
-            print(f"Pred    : '{p}'")
-            print(f"Fuzzy % : {fuzz.ratio(t, p)}")
-            print("-" * 40)
-
-        if t == "" or p == "":
-            continue
-
-        total += 1
-        if t == p or fuzz.ratio(t, p) >= 90:
-            correct += 1
-
-    score = (correct / total * 100) if total > 0 else 0
-    field_scores[field] = score
+# Only pairs where both normalized values are non-empty are compared
+results, mismatches = evaluate(merged, ATTRS, NORMALIZERS, presence="normalized")
+field_scores = {field: m["acc"] for field, m in results.items()}
 
 # Optionally remove address from overall accuracy
 # overall = sum([v for k,v in field_scores.items() if k != "address"]) / (len(field_scores)-1)
@@ -102,3 +86,6 @@ for f, s in field_scores.items():
     print(f"{f:12s}: {s:.2f}%")
 print(f"Overall Accuracy: {overall:.2f}%")
 
+n = write_mismatches(mismatches, MISMATCH_FILE)
+print(f"\nWrote {n} mismatch samples to {MISMATCH_FILE}")
+
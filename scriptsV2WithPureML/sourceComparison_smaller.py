@@ -1,19 +1,21 @@
 import json
+import sys
+from pathlib import Path
 import pandas as pd
 from rapidfuzz import fuzz
 import re
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.yelp_loader import load_yelp as load_yelp_columns
+from src.utils.text_normalization import normalize_column, scrub_text
+from sourcesComparison import build_phone_index, resolve_phone_matches
+
 # ============================
 # HELPERS
 # ============================
 
-def clean_text(x):
-    if not x:
-        return ""
-    x = str(x).lower()
-    x = re.sub(r"[^a-z0-9 ]", " ", x)
-    return re.sub(r"\s+", " ", x).strip()
-
 def clean_phone(p):
     if not p:
         return ""
@@ -38,36 +40,29 @@ def load_omf(path):
     for _, r in df.iterrows():
         rows.append({
             "place_id": r.get("id", ""),          # safer access
-            "name": clean_text(r.get("name", "")),
-            "addr": clean_text(r.get("address", "")),
+            "name": scrub_text(r.get("name", "")),
+            "addr": scrub_text(r.get("address", "")),
             "phone": clean_phone(r.get("phones", "")),
             "categories": to_json_list(r.get("category", "")),
             "website": to_json_list(r.get("websites", "")),
             "socials": to_json_list(r.get("socials", "")),
             "source": r.get("source_file", "omf"),
-            "city": clean_text(r.get("city", ""))   # <-- ADD THIS
+            "city": scrub_text(r.get("city", ""))   # <-- ADD THIS
 
         })
     return pd.DataFrame(rows)
 
 
 def load_yelp(path):
-    rows = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                obj = json.loads(line)
-            except:
-                continue
-            rows.append({
-                "business_id": obj.get("business_id"),
-                "name": clean_text(obj.get("name")),
-                "addr": clean_text(obj.get("address", "")),
-                "phone": clean_phone(obj.get("phone")),
-                "categories": clean_text(str(obj.get("categories", ""))),
-                "city": clean_text(obj.get("city", ""))  # <-- include city here
-            })
-    return pd.DataFrame(rows)
+    raw = load_yelp_columns(path, ["business_id", "name", "address", "phone", "categories", "city"])
+    return pd.DataFrame({
+        "business_id": raw["business_id"],
+        "name": normalize_column(raw["name"], scrub_text),
+        "addr": normalize_column(raw["address"], scrub_text),
+        "phone": raw["phone"].map(clean_phone),
+        "categories": normalize_column(raw["categories"].map(str), scrub_text),
+        "city": normalize_column(raw["city"], scrub_text)
+    })
 
 '''
 # ============================
@@ -150,8 +145,12 @@ def validate(omf_df, yelp_df):
         if city:
             yelp_lookup[city] = group.to_dict('records')
 
+    # Exact (city, phone) matches score 100 without fuzzy matching
+    phone_hits = resolve_phone_matches(omf_df, build_phone_index(yelp_lookup))
+    print(f"Phone pre-pass resolved {len(phone_hits)} OMF records")
+
     print("Matching OMF records...")
-    for _, omf in omf_df.iterrows():
+    for label, omf in omf_df.iterrows():
         city = omf["city"]
         if not city or city not in yelp_lookup:
             continue  # skip if city missing or no Yelp records
@@ -159,6 +158,9 @@ def validate(omf_df, yelp_df):
         candidates = yelp_lookup[city]
         best_score = 0
         best_record = None
+        if label in phone_hits:
+            best_score, best_record = 100, phone_hits[label]
+            candidates = []
         '''
         for y in candidates:
             score = calculate_score(omf, y)
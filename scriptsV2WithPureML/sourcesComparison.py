@@ -1,38 +1,46 @@
+import argparse
 import json
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
 import pandas as pd
 from rapidfuzz import fuzz
 import re
 
+# Add project root so imports work
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.utils.normalized_sources import find_normalized, read_normalized
+from src.utils.text_normalization import normalize_column, scrub_text
+from src.utils.yelp_loader import load_yelp as load_yelp_columns
+
 # ======================================================
 # CLEANING HELPERS
 # ======================================================
 
-def clean_text(x):
-    if not x: return ""
-    x = str(x).lower()
-    x = re.sub(r"[^a-z0-9 ]", " ", x)
-    return re.sub(r"\s+", " ", x).strip()
-
 def clean_phone(p):
     if not p: return ""
     p = re.sub(r"\D", "", str(p))
     return p[-10:] if len(p) >= 10 else p
 
 def safe_json(val):
-    """Helper to safely parse JSON or return empty list"""
-    if pd.isna(val) or val == "": return []
+    """Helper to safely parse JSON or return empty list (typed Parquet values pass through)"""
+    if isinstance(val, (list, dict)): return val
+    if val is None or pd.isna(val) or val == "": return []
     try: return json.loads(val)
     except: return []
 
 def parse_address(addr_list):
     if not addr_list: return "", "", "", "", "", ""
     a = addr_list[0]
-    street  = clean_text(a.get("freeform", ""))
-    city    = clean_text(a.get("locality", ""))
-    state   = clean_text(a.get("region", ""))
-    postal  = clean_text(a.get("postcode", ""))
-    country = clean_text(a.get("country", ""))
-    full = clean_text(f"{street} {city} {state} {postal}")
+    street  = scrub_text(a.get("freeform", ""))
+    city    = scrub_text(a.get("locality", ""))
+    state   = scrub_text(a.get("region", ""))
+    postal  = scrub_text(a.get("postcode", ""))
+    country = scrub_text(a.get("country", ""))
+    full = scrub_text(f"{street} {city} {state} {postal}")
     return full, street, city, state, postal, country
 
 def extract_domain(urls):
@@ -47,7 +55,7 @@ def extract_domain(urls):
 # ======================================================
 
 def load_omf(path):
-    df = pd.read_csv(path)
+    df = read_normalized(path)
     rows = []
     for _, r in df.iterrows():
         cats = safe_json(r.get("categories"))
@@ -60,7 +68,7 @@ def load_omf(path):
         rows.append({
             "place_id": r["place_id"],
             "source": r["source"],
-            "name": clean_text(r["name"]),
+            "name": scrub_text(r["name"]),
             "phone": clean_phone(r.get("phone")),
             "domain": extract_domain(websites),
             "addr": full_addr,
@@ -73,26 +81,21 @@ def load_omf(path):
     return pd.DataFrame(rows)
 
 def load_yelp(path):
-    rows = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            try: obj = json.loads(line)
-            except: continue
-            
-            street = clean_text(obj.get("address", ""))
-            city = clean_text(obj.get("city", ""))
-            state = clean_text(obj.get("state", ""))
-            postal = clean_text(obj.get("postal_code", ""))
-            
-            rows.append({
-                "business_id": obj.get("business_id"),
-                "name": clean_text(obj.get("name")),
-                "phone": clean_phone(obj.get("phone")),
-                "categories": clean_text(str(obj.get("categories", ""))),
-                "street": street, "city": city, "state": state, "postal": postal,
-                "addr": clean_text(f"{street} {city} {state} {postal}")
-            })
-    return pd.DataFrame(rows)
+    raw = load_yelp_columns(path, ["business_id", "name", "phone", "categories",
+                                   "address", "city", "state", "postal_code"])
+    street = normalize_column(raw["address"], scrub_text)
+    city = normalize_column(raw["city"], scrub_text)
+    state = normalize_column(raw["state"], scrub_text)
+    postal = normalize_column(raw["postal_code"], scrub_text)
+
+    return pd.DataFrame({
+        "business_id": raw["business_id"],
+        "name": normalize_column(raw["name"], scrub_text),
+        "phone": raw["phone"].map(clean_phone),
+        "categories": normalize_column(raw["categories"].map(str), scrub_text),
+        "street": street, "city": city, "state": state, "postal": postal,
+        "addr": normalize_column(street + " " + city + " " + state + " " + postal, scrub_text)
+    })
 
 # ======================================================
 # MATCHING LOGIC
@@ -108,37 +111,308 @@ def calculate_score(omf_row, yelp_row):
     ad = fuzz.token_sort_ratio(omf_row["addr"], yelp_row["addr"])
     return (0.65 * ns) + (0.35 * ad)
 
-def validate(omf_df, yelp_df):
-    matchable = 0
-    valid = 0
-    valid_rows = []
+MIN_MATCHABLE = 55     # best score counted as "matchable"
+MIN_VALID = 75         # best score written to VALID_MATCHES.csv
+NAME_W, ADDR_W = 0.65, 0.35
+EPS = 1e-6             # slack on every bound so float rounding never prunes a real winner
 
-    # OPTIMIZATION: Group Yelp by City into a dictionary for O(1) lookup
-    print("Indexing Yelp data by city...")
+def record_lengths(records):
+    """Name and address lengths of Yelp records, as arrays for the score bounds."""
+    return (np.fromiter((len(y["name"]) for y in records), dtype=np.float64, count=len(records)),
+            np.fromiter((len(y["addr"]) for y in records), dtype=np.float64, count=len(records)))
+
+def ratio_bound(len_a, len_b):
+    """Upper bound of token_sort_ratio from string lengths (indel distance >= length gap)."""
+    total = len_a + len_b
+    return np.where(total == 0, 100.0, 200.0 * np.minimum(len_a, len_b) / np.maximum(total, 1)) + EPS
+
+def best_match(omf, candidates, lengths=None):
+    """
+    Highest-scoring candidate (first one wins ties), identical to scanning
+    every candidate with calculate_score as far as validate() can tell:
+    candidates that cannot reach MIN_MATCHABLE or beat the current best are
+    pruned, so rows whose best stays under MIN_MATCHABLE return (0, None).
+
+    - length bounds skip a candidate before any fuzzy call, and stop the scan
+      once no remaining candidate can improve the result
+    - score_cutoff lets rapidfuzz bail out of the name ratio early, and the
+      address ratio is skipped when name alone cannot win
+
+    Exact phone matches are expected to have been resolved by the pre-pass
+    (resolve_phone_matches); the bounds do not account for them.
+    """
+    if not candidates: return 0, None
+    name_len, addr_len = lengths if lengths is not None else record_lengths(candidates)
+    upper = (NAME_W * ratio_bound(len(omf["name"]), name_len)
+             + ADDR_W * ratio_bound(len(omf["addr"]), addr_len))
+    remaining = np.maximum.accumulate(upper[::-1])[::-1]
+
+    name, addr, phone = omf["name"], omf["addr"], omf["phone"]
+    best_score = 0
+    best_record = None
+
+    for i, y in enumerate(candidates):
+        need = max(best_score, MIN_MATCHABLE)
+        if remaining[i] < need: break
+        if upper[i] < need: continue
+
+        if phone and y["phone"] and phone == y["phone"]:
+            score = 100
+        else:
+            ns = fuzz.token_sort_ratio(name, y["name"], score_cutoff=max(0, (need - ADDR_W * 100) / NAME_W - EPS))
+            if NAME_W * ns + ADDR_W * 100 + EPS < need: continue
+            ad = fuzz.token_sort_ratio(addr, y["addr"], score_cutoff=max(0, (need - NAME_W * ns) / ADDR_W - EPS))
+            score = (0.65 * ns) + (0.35 * ad)
+
+        if score > best_score and score >= MIN_MATCHABLE:
+            best_score = score
+            best_record = y
+            if best_score == 100: break # Stop early if perfect match
+
+    return best_score, best_record
+
+def build_yelp_lookup(yelp_df):
+    """Groups Yelp records by city into a dictionary for O(1) lookup."""
     yelp_lookup = {}
     for city, group in yelp_df.groupby("city"):
         if city: yelp_lookup[city] = group.to_dict('records')
+    return yelp_lookup
+
+# ======================================================
+# PHONE PRE-PASS
+# ======================================================
+
+def token_key(s):
+    """Sorted-token form of a cleaned string; token_sort_ratio is 100 exactly when these are equal."""
+    return " ".join(sorted(s.split()))
+
+def build_phone_index(yelp_lookup):
+    """
+    Two hash tables over city positions, keeping the first record per key:
+    (city, phone) for golden-rule matches, and (city, name tokens, address
+    tokens) for fuzzy scores of exactly 100. The city scan stops at whichever
+    of the two comes first, so both are needed to reproduce it.
+    """
+    phone_index, text_index = {}, {}
+    for city, records in yelp_lookup.items():
+        for pos, y in enumerate(records):
+            if y["phone"]: phone_index.setdefault((city, y["phone"]), (pos, y))
+            text_index.setdefault((city, token_key(y["name"]), token_key(y["addr"])), (pos, y))
+    return phone_index, text_index
+
+def resolve_phone_matches(omf_df, indexes):
+    """
+    Hash-joins every OMF row on (city, phone) in one pass.
+    Returns {omf index label: Yelp record}; these rows score 100 without any
+    fuzzy comparisons, and only the remainder goes to fuzzy matching. If an
+    exact name + address record comes earlier in the city, it is returned
+    instead, as the city scan would.
+    """
+    phone_index, text_index = indexes
+    hits = {}
+    for label, city, phone, name, addr in zip(omf_df.index, omf_df["city"], omf_df["phone"],
+                                              omf_df["name"], omf_df["addr"]):
+        if not phone or (city, phone) not in phone_index: continue
+        pos, y = phone_index[(city, phone)]
+        exact = text_index.get((city, token_key(name), token_key(addr)))
+        if exact is not None and exact[0] < pos: pos, y = exact
+        hits[label] = y
+    return hits
+
+# ======================================================
+# TOKEN BLOCKING
+# ======================================================
+
+BLOCKING = "city"       # exhaustive per city; "token" (lossy, opt-in) scores only records sharing a rare token
+STOP_TOKEN_IDF = 3.0    # tokens with idf below this (in > ~5% of a city's records) are stop tokens
+MIN_STOP_DF = 20        # ...unless they appear in this few records or fewer
+AUDIT_SAMPLE = 500      # OMF rows re-scored exhaustively to estimate token blocking's recall loss
+
+def record_tokens(r):
+    """Name + address tokens, plus the phone as a 'tel:' token so phone matches are always candidates."""
+    toks = set(r["name"].split()) | set(r["addr"].split())
+    if r["phone"]: toks.add("tel:" + r["phone"])
+    return toks
 
-    print("Matching OMF records...")
-    for _, omf in omf_df.iterrows():
-        # Fast lookup
-        candidates = yelp_lookup.get(omf["city"], [])
-        if not candidates: continue
+def build_token_index(records):
+    """
+    Inverted index over one city's Yelp records: token -> sorted record positions.
+    Common tokens (low IDF) go to a separate stop table so they never fan out to
+    most of the city; phone tokens are never treated as stop tokens.
+    """
+    postings = {}
+    for i, y in enumerate(records):
+        for tok in record_tokens(y):
+            postings.setdefault(tok, []).append(i)
 
-        best_score = 0
-        best_record = None
+    stop_df = max(MIN_STOP_DF, len(records) * math.exp(-STOP_TOKEN_IDF))
+    index, stop = {}, {}
+    for tok, pos in postings.items():
+        table = stop if len(pos) > stop_df and not tok.startswith("tel:") else index
+        table[tok] = np.asarray(pos, dtype=np.int64)
+    return index, stop
 
-        for y in candidates:
-            score = calculate_score(omf, y)
-            if score > best_score:
-                best_score = score
-                best_record = y
-                if best_score == 100: break # Stop early if perfect match
+def candidate_positions(token_index, omf):
+    """
+    City positions of Yelp records that share a rare token with the OMF row,
+    or that contain every stop token of its name (so names built from common
+    words like "pizza house" still block), in city order so ties resolve as
+    in the exhaustive scan.
+    """
+    index, stop = token_index
+    toks = record_tokens(omf)
+    hits = [index[t] for t in toks if t in index]
 
-        if best_score >= 55: matchable += 1
+    common_name = [stop[t] for t in set(omf["name"].split()) if t in stop]
+    if common_name:
+        shared = common_name[0]
+        for pos in common_name[1:]:
+            shared = np.intersect1d(shared, pos, assume_unique=True)
+        hits.append(shared)
+
+    if not hits: return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(hits))
+
+def match_rows(omf_df, yelp_lookup, blocking=BLOCKING, phone_index=None):
+    """
+    Yields (omf_row, best_score, best_record) for every OMF row whose city has
+    Yelp records, plus running pair counts in stats (exhaustive vs scored).
+    Exact phone matches are resolved up front by resolve_phone_matches
+    (pass phone_index to reuse one built by build_phone_index).
+    """
+    token_indexes = {}
+    city_lengths = {}
+    if phone_index is None: phone_index = build_phone_index(yelp_lookup)
+    phone_hits = resolve_phone_matches(omf_df, phone_index)
+    stats = {"exhaustive_pairs": 0, "scored_pairs": 0, "phone_matches": len(phone_hits)}
+
+    def rows():
+        for label, omf in omf_df.iterrows():
+            candidates = yelp_lookup.get(omf["city"], [])
+            if not candidates: continue
+            stats["exhaustive_pairs"] += len(candidates)
+
+            if label in phone_hits:
+                yield omf, 100, phone_hits[label]
+                continue
+
+            if omf["city"] not in city_lengths:
+                city_lengths[omf["city"]] = record_lengths(candidates)
+            lengths = city_lengths[omf["city"]]
+
+            if blocking == "token":
+                if omf["city"] not in token_indexes:
+                    token_indexes[omf["city"]] = build_token_index(candidates)
+                positions = candidate_positions(token_indexes[omf["city"]], omf)
+                candidates = [candidates[i] for i in positions]
+                lengths = (lengths[0][positions], lengths[1][positions])
+            stats["scored_pairs"] += len(candidates)
+
+            best_score, best_record = best_match(omf, candidates, lengths)
+            yield omf, best_score, best_record
+
+    return rows(), stats
+
+def print_blocking_stats(stats):
+    print(f"Phone pre-pass resolved {stats['phone_matches']:,} OMF rows")
+    if stats["exhaustive_pairs"]:
+        reduction = 1 - stats["scored_pairs"] / stats["exhaustive_pairs"]
+        print(f"Scored {stats['scored_pairs']:,} of {stats['exhaustive_pairs']:,} city pairs "
+              f"(candidate reduction {reduction * 100:.2f}%)")
+
+def audit_blocking(omf_df, yelp_df, sample=AUDIT_SAMPLE, seed=42):
+    """
+    Re-scores a sample of OMF rows exhaustively and with token blocking.
+    Recall loss = share of exhaustive valid matches (score >= 75) that token
+    blocking misses or resolves to a different Yelp record.
+    """
+    yelp_lookup = build_yelp_lookup(yelp_df)
+    sample_df = omf_df.sample(n=min(sample, len(omf_df)), random_state=seed)
+
+    results = {}
+    for mode in ["city", "token"]:
+        rows, stats = match_rows(sample_df, yelp_lookup, blocking=mode)
+        results[mode] = {
+            omf.name: best_record["business_id"]
+            for omf, best_score, best_record in rows
+            if best_score >= MIN_VALID and best_record
+        }
+        if mode == "token": print_blocking_stats(stats)
+
+    exhaustive = results["city"]
+    lost = sum(1 for i, bid in exhaustive.items() if results["token"].get(i) != bid)
+    loss = lost / len(exhaustive) if exhaustive else 0.0
+    print(f"Blocking audit on {len(sample_df)} OMF rows: {len(exhaustive)} exhaustive valid matches, "
+          f"{lost} lost (recall loss {loss * 100:.2f}%)")
+    return loss
+
+# ======================================================
+# PARALLEL CITY SHARDS
+# ======================================================
+
+SHARD_ROWS = 2000  # OMF rows per task; bigger cities are sliced into several tasks
+_shared = {}
+
+def plan_shards(omf_df, yelp_lookup, shard_rows=SHARD_ROWS):
+    """OMF row positions grouped by city (cities with Yelp records only), largest shards first."""
+    shards = []
+    for city, positions in omf_df.groupby("city", sort=False).indices.items():
+        if city not in yelp_lookup: continue
+        for start in range(0, len(positions), shard_rows):
+            shards.append(positions[start:start + shard_rows])
+    return sorted(shards, key=len, reverse=True)
+
+def _init_worker(omf_df, yelp_lookup, phone_index):
+    """Under fork these are inherited copy-on-write; under spawn they are pickled once per worker."""
+    _shared.update(omf=omf_df, yelp_lookup=yelp_lookup, phone_index=phone_index)
+
+def _match_shard(positions, blocking):
+    """Best matches of one shard as (omf position, best_score, best_record); rows under MIN_MATCHABLE are dropped."""
+    part = _shared["omf"].iloc[positions].set_axis(positions)
+    rows, stats = match_rows(part, _shared["yelp_lookup"], blocking, _shared["phone_index"])
+    found = [(omf.name, best_score, best_record)
+             for omf, best_score, best_record in rows if best_score >= MIN_MATCHABLE]
+    return found, stats
+
+def match_rows_parallel(omf_df, yelp_lookup, blocking, workers):
+    """
+    Same results as match_rows (minus rows under MIN_MATCHABLE), computed by a
+    process pool over city shards and merged back in OMF row order.
+    """
+    phone_index = build_phone_index(yelp_lookup)
+    shards = plan_shards(omf_df, yelp_lookup)
+    print(f"Matching {len(shards)} city shards on {workers} workers...")
+
+    found = []
+    stats = {"exhaustive_pairs": 0, "scored_pairs": 0, "phone_matches": 0}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(omf_df, yelp_lookup, phone_index)) as pool:
+        for shard_found, shard_stats in pool.map(_match_shard, shards, [blocking] * len(shards)):
+            found.extend(shard_found)
+            for k, v in shard_stats.items(): stats[k] += v
+
+    found.sort(key=lambda r: r[0])
+    rows = ((omf_df.iloc[pos], best_score, best_record) for pos, best_score, best_record in found)
+    return rows, stats
+
+def validate(omf_df, yelp_df, blocking=BLOCKING, workers=1):
+    matchable = 0
+    valid = 0
+    valid_rows = []
+
+    print("Indexing Yelp data by city...")
+    yelp_lookup = build_yelp_lookup(yelp_df)
+
+    print(f"Matching OMF records ({blocking} blocking)...")
+    if workers > 1:
+        rows, stats = match_rows_parallel(omf_df, yelp_lookup, blocking, workers)
+    else:
+        rows, stats = match_rows(omf_df, yelp_lookup, blocking)
+    for omf, best_score, best_record in rows:
+        if best_score >= MIN_MATCHABLE: matchable += 1
         
         # Threshold for "Valid" match
-        if best_score >= 75 and best_record:
+        if best_score >= MIN_VALID and best_record:
             valid += 1
             valid_rows.append({
                 "omf_place_id": omf["place_id"],
@@ -159,6 +433,7 @@ def validate(omf_df, yelp_df):
                 "match_score": best_score
             })
 
+    print_blocking_stats(stats)
     return len(omf_df), matchable, valid, valid_rows
 
 # ======================================================
@@ -166,10 +441,25 @@ def validate(omf_df, yelp_df):
 # ======================================================
 
 if __name__ == "__main__":
-    omf = load_omf("NORMALIZED_SOURCES.csv")
+    parser = argparse.ArgumentParser(description="Validate OMF records against Yelp.")
+    parser.add_argument("--blocking", choices=["token", "city"], default=BLOCKING,
+                        help="token: score only Yelp records sharing a rare name/address token; city: score the whole city")
+    parser.add_argument("--audit", type=int, default=0, metavar="N",
+                        help="OMF rows sampled to compare token blocking with the exhaustive scan "
+                             f"(always run with --blocking token, on {AUDIT_SAMPLE} rows unless N is given)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Process-pool size for city-sharded matching; 1 runs in this process")
+    args = parser.parse_args()
+
+    omf = load_omf(find_normalized("NORMALIZED_SOURCES"))
     yelp = load_yelp("../data/raw/yelp_academic_dataset_business.json")
 
-    total, matchable, valid, valid_rows = validate(omf, yelp)
+    # Token blocking is lossy: always report its estimated recall loss next to the candidate reduction
+    audit = args.audit or (AUDIT_SAMPLE if args.blocking == "token" else 0)
+    if audit:
+        audit_blocking(omf, yelp, sample=audit)
+
+    total, matchable, valid, valid_rows = validate(omf, yelp, blocking=args.blocking, workers=args.workers)
 
     print("\n=== VALIDATION SUMMARY ===")
     print(f"Total OMF: {total}")
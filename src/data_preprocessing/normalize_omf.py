@@ -1,12 +1,7 @@
 import geopandas as gpd
 import pandas as pd
-import numpy as np
-from unidecode import unidecode
-
-def clean_text(x):
-    if pd.isnull(x) or str(x).strip() == "":
-        return np.nan
-    return unidecode(str(x).strip().lower())
+from src.utils.interim_storage import write_interim
+from src.utils.text_normalization import fold_text, normalize_column
 
 def normalize_omf_geojson(input_file: str, output_file: str):
     gdf = gpd.read_file(input_file)
@@ -17,7 +12,7 @@ def normalize_omf_geojson(input_file: str, output_file: str):
 
     text_columns = ['name', 'address', 'category']
     for col in text_columns:
-        gdf[col] = gdf[col].apply(clean_text)
+        gdf[col] = normalize_column(gdf[col], fold_text)
 
     gdf.dropna(subset=['name', 'geometry'], inplace=True)
 
@@ -26,15 +21,16 @@ def normalize_omf_geojson(input_file: str, output_file: str):
         if pd.isnull(cat):
             return []
         if isinstance(cat, list):
-            return [clean_text(c) for c in cat]
-        return [clean_text(c) for c in str(cat).split(',')]
+            return [fold_text(c) for c in cat]
+        return [fold_text(c) for c in str(cat).split(',')]
 
     gdf['category'] = gdf['category'].apply(normalize_category)
 
-    gdf.to_file(output_file, driver='GeoJSON')
+    output_file = write_interim(gdf, output_file)
     print(f"Normalized OMF data saved to {output_file}")
     return gdf
 
 # Example usage:
-# normalize_omf_geojson('data/raw/omf_phoenix.geojson', 'data/interim/omf_phoenix_normalized.geojson')
+# normalize_omf_geojson('data/raw/omf_phoenix.geojson', 'data/interim/omf_phoenix_normalized')
+# (output written as GeoParquet by default; pass a .geojson path to force GeoJSON)
 
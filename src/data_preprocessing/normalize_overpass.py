@@ -1,12 +1,7 @@
 import geopandas as gpd
-import pandas as pd
 import numpy as np
-from unidecode import unidecode
-
-def clean_text(x):
-    if pd.isnull(x) or str(x).strip() == "":
-        return np.nan
-    return unidecode(str(x).strip().lower())
+from src.utils.interim_storage import write_interim
+from src.utils.text_normalization import fold_text
 
 def extract_category(props):
     keys = ["amenity", "shop", "office", "tourism", "craft", "service"]
@@ -14,19 +9,19 @@ def extract_category(props):
     cats = []
     for k in keys:
         if k in props and props[k]:
-            cats.append(clean_text(props[k]))
+            cats.append(fold_text(props[k]))
     return cats
 
 def extract_address(props):
     if "addr:full" in props:
-        return clean_text(props["addr:full"])
+        return fold_text(props["addr:full"])
     
     parts = []
     for key in ["addr:housenumber", "addr:street", "addr:city", "addr:state"]:
         if key in props:
             parts.append(str(props[key]))
     if parts:
-        return clean_text(" ".join(parts))
+        return fold_text(" ".join(parts))
     
     return np.nan
 
@@ -37,7 +32,7 @@ def normalize_overpass_geojson(input_file: str, output_file: str):
     props = gdf["properties"]
 
     gdf["id"] = props.apply(lambda p: f"{p.get('@type', 'osm')}_{p.get('@id')}")
-    gdf["name"] = props.apply(lambda p: clean_text(p.get("name")))
+    gdf["name"] = props.apply(lambda p: fold_text(p.get("name")))
     gdf["address"] = props.apply(extract_address)
     gdf["category"] = props.apply(extract_category)
 
@@ -47,7 +42,7 @@ def normalize_overpass_geojson(input_file: str, output_file: str):
     # Drop rows missing required fields
     gdf.dropna(subset=["name", "geometry"], inplace=True)
 
-    gdf.to_file(output_file, driver='GeoJSON')
+    output_file = write_interim(gdf, output_file)
     print(f"Normalized Overpass data saved to {output_file}")
 
     return gdf
@@ -0,0 +1,101 @@
+"""
+Column-wise scoring of best-attribute outputs against a golden dataset.
+
+machinelearning_eval.py and rulebased_evalV3.py used to walk the merged
+gold/prediction frame with iterrows() and call fuzz.ratio per cell. Here each
+attribute column is normalized once (normalize_column, so repeated values are
+cleaned once), all truth/prediction pairs are scored in one multithreaded
+rapidfuzz.process.cpdist call and the counts come from NumPy masks.
+
+A pair matches when the normalized values are equal or fuzz.ratio >= 90.
+Mismatching pairs are collected for write_mismatches() instead of printed.
+"""
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz
+from rapidfuzz.process import cpdist
+
+from src.utils.text_normalization import normalize_column
+
+FUZZY_THRESHOLD = 90
+MISMATCH_LIMIT = 200  # samples per attribute in the mismatch file
+
+def is_present(values):
+    """Raw presence: not null and not blank text. Lists/dicts from typed (Parquet) columns count as present."""
+    s = pd.Series(values, dtype=object)
+    out = s.notna().to_numpy().copy()
+    out[out] = (s[out].map(str).str.strip() != "").to_numpy()
+    return out
+
+def fuzzy_match(truth, pred, threshold=FUZZY_THRESHOLD, workers=-1):
+    """(match mask, fuzz.ratio scores) for aligned string arrays, scored pairwise with cpdist."""
+    truth, pred = list(truth), list(pred)
+    if not truth:
+        return np.zeros(0, dtype=bool), np.zeros(0)
+    scores = cpdist(truth, pred, scorer=fuzz.ratio, dtype=np.float64, workers=workers)
+    return (np.asarray(truth, dtype=object) == np.asarray(pred, dtype=object)) | (scores >= threshold), scores
+
+def score_attribute(truth_raw, pred_raw, normalizer, presence="raw", threshold=FUZZY_THRESHOLD, workers=-1):
+    """
+    Metrics for one attribute. presence="raw" counts a value as present
+    before normalization (machinelearning_eval); "normalized" requires a
+    non-empty normalized value (rulebased_evalV3). Pairs are only compared
+    where both sides are present.
+
+    Returns (metrics dict, DataFrame of the compared pairs with their score
+    and match flag, indexed like the inputs).
+    """
+    truth_n = np.asarray(normalize_column(pd.Series(truth_raw, dtype=object), normalizer), dtype=object)
+    pred_n = np.asarray(normalize_column(pd.Series(pred_raw, dtype=object), normalizer), dtype=object)
+    if presence == "raw":
+        has_truth, has_pred = is_present(truth_raw), is_present(pred_raw)
+    else:
+        has_truth, has_pred = truth_n != "", pred_n != ""
+
+    both = has_truth & has_pred
+    match, scores = fuzzy_match(truth_n[both], pred_n[both], threshold, workers)
+
+    tp, n_both = int(match.sum()), int(both.sum())
+    n_truth, n_pred = int(has_truth.sum()), int(has_pred.sum())
+    accuracy = tp / n_both * 100 if n_both else 0.0
+    precision = tp / n_pred * 100 if n_pred else 0.0
+    recall = tp / n_truth * 100 if n_truth else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+
+    metrics = {"tp": tp, "compared": n_both, "truth_count": n_truth, "pred_count": n_pred,
+               "acc": accuracy, "prec": precision, "rec": recall, "f1": f1}
+    pairs = pd.DataFrame({
+        "truth": np.asarray(truth_raw, dtype=object)[both], "pred": np.asarray(pred_raw, dtype=object)[both],
+        "truth_norm": truth_n[both], "pred_norm": pred_n[both], "score": scores, "match": match,
+    }, index=np.flatnonzero(both))
+    return metrics, pairs
+
+def evaluate(df, attrs, normalizers, presence="raw", threshold=FUZZY_THRESHOLD, workers=-1, key="place_id"):
+    """
+    score_attribute() for every field in attrs ({field: (truth_col, pred_col)}),
+    normalizing with normalizers[field]. Missing prediction columns score as
+    empty. Returns ({field: metrics}, mismatches DataFrame).
+    """
+    results, mismatches = {}, []
+    for field, (truth_col, pred_col) in attrs.items():
+        empty = pd.Series("", index=df.index, dtype=object)
+        truth = df[truth_col] if truth_col in df.columns else empty
+        pred = df[pred_col] if pred_col in df.columns else empty
+        metrics, pairs = score_attribute(truth.to_numpy(dtype=object), pred.to_numpy(dtype=object),
+                                         normalizers[field], presence, threshold, workers)
+        results[field] = metrics
+        bad = pairs[~pairs["match"]].drop(columns="match")
+        bad.insert(0, "attribute", field)
+        if key in df.columns:
+            bad.insert(0, key, df[key].to_numpy()[bad.index])
+        mismatches.append(bad)
+    return results, pd.concat(mismatches, ignore_index=True)
+
+def write_mismatches(mismatches, path, limit=MISMATCH_LIMIT):
+    """Writes up to limit mismatching pairs per attribute (lowest scores first) and returns the row count."""
+    sample = (mismatches.sort_values("score", kind="stable")
+                        .groupby("attribute", sort=False).head(limit))
+    sample.to_csv(Path(path), index=False)
+    return len(sample)
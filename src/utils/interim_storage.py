@@ -0,0 +1,99 @@
+"""
+Interim storage for the matching pipeline.
+
+Every stage between normalization and the triplet table hands GeoDataFrames
+to the next one through ../data/interim. The default format is GeoParquet
+(WKB geometry, columnar, compressed); GeoJSON stays available both as an
+export and as the whole-pipeline format via INTERIM_FORMAT=geojson.
+
+Paths are passed around without an extension ("stems") and resolved here,
+so switching formats does not touch the stages themselves.
+"""
+
+import os
+from pathlib import Path
+import pandas as pd
+import geopandas as gpd
+
+INTERIM_FORMAT = os.environ.get("INTERIM_FORMAT", "parquet")
+EXTENSIONS = {"parquet": ".parquet", "geojson": ".geojson"}
+
+def format_for(path):
+    """Storage format implied by a path's extension (None if unknown)."""
+    suffix = Path(path).suffix.lower()
+    for fmt, ext in EXTENSIONS.items():
+        if suffix == ext:
+            return fmt
+    return None
+
+def interim_path(stem, fmt=None):
+    """'../data/interim/omf_all_merged' -> '../data/interim/omf_all_merged.parquet'"""
+    fmt = fmt or INTERIM_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown interim format '{fmt}', expected one of {list(EXTENSIONS)}")
+    stem = Path(stem)
+    if format_for(stem):
+        stem = stem.with_suffix("")
+    return stem.with_name(stem.name + EXTENSIONS[fmt])
+
+def find_interim(stem):
+    """
+    Existing file for a stem, preferring INTERIM_FORMAT and falling back to
+    the other formats (e.g. GeoJSON outputs of an older run).
+    """
+    order = [INTERIM_FORMAT] + [f for f in EXTENSIONS if f != INTERIM_FORMAT]
+    for fmt in order:
+        path = interim_path(stem, fmt)
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"No interim file for {stem} ({', '.join(EXTENSIONS.values())})")
+
+def glob_interim(directory, pattern):
+    """
+    Files matching pattern (without extension) in directory, one per stem,
+    preferring INTERIM_FORMAT when both formats exist.
+    """
+    found = {}
+    for fmt in [f for f in EXTENSIONS if f != INTERIM_FORMAT] + [INTERIM_FORMAT]:
+        for path in Path(directory).glob(pattern + EXTENSIONS[fmt]):
+            found[path.with_suffix("")] = path
+    return sorted(found.values())
+
+def write_interim(gdf, path, fmt=None):
+    """
+    Writes gdf to path. The format comes from fmt, else the path's extension,
+    else INTERIM_FORMAT (in which case the extension is added).
+    Returns the path written.
+    """
+    fmt = fmt or format_for(path) or INTERIM_FORMAT
+    path = interim_path(path, fmt)
+    if fmt == "parquet":
+        gdf.to_parquet(path, index=False)
+    else:
+        gdf.to_file(path, driver="GeoJSON")
+    return path
+
+def read_interim(path, columns=None, geometry=True):
+    """
+    Reads an interim file. columns prunes the read to those columns; with
+    geometry=False the geometry is never decoded and a plain DataFrame is
+    returned.
+    """
+    path = Path(path)
+    if format_for(path) == "parquet":
+        if not geometry:
+            return pd.read_parquet(path, columns=columns)
+        if columns is not None and "geometry" not in columns:
+            columns = list(columns) + ["geometry"]
+        return gpd.read_parquet(path, columns=columns)
+
+    if not geometry:
+        return pd.DataFrame(gpd.read_file(path, columns=columns, ignore_geometry=True))
+    return gpd.read_file(path, columns=columns)
+
+def export_geojson(path):
+    """Writes a GeoJSON copy next to an interim file and returns its path."""
+    out = interim_path(path, "geojson")
+    if Path(path) != out:
+        read_interim(path).to_file(out, driver="GeoJSON")
+    return out
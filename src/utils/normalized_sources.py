@@ -0,0 +1,206 @@
+"""
+Typed storage for NORMALIZED_SOURCES (one row per OMF source record).
+
+normalize_omf.py used to json.dumps categories, phones, websites, socials and
+addresses into CSV text, and every later stage json.loads'ed them again row by
+row. The Parquet copy keeps them as typed columns instead:
+
+  categories  struct<primary, alternate: list<string>>
+  phone       list<string>
+  website     list<string>
+  socials     list<string>
+  address     list<struct<freeform, locality, postcode, region, country>>
+
+read_normalized() hands these back as plain Python lists/dicts in object
+columns, i.e. the values json.loads would have produced. CSV files (older
+runs, or the flattened "addr" variant from normalize_omf_all.py) are read
+through the same function with their JSON columns parsed once on load.
+"""
+
+import json
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+NORMALIZED_STEM = "NORMALIZED_SOURCES"
+JSON_COLUMNS = ["categories", "phone", "website", "socials", "address"]
+ADDRESS_FIELDS = ["freeform", "locality", "postcode", "region", "country"]
+
+SCHEMA = pa.schema([
+    ("place_id", pa.string()),
+    ("source", pa.string()),
+    ("record_id", pa.string()),
+    ("update_time", pa.string()),
+    ("name", pa.string()),
+    ("categories", pa.struct([("primary", pa.string()), ("alternate", pa.list_(pa.string()))])),
+    ("phone", pa.list_(pa.string())),
+    ("website", pa.list_(pa.string())),
+    ("socials", pa.list_(pa.string())),
+    ("address", pa.list_(pa.struct([(f, pa.string()) for f in ADDRESS_FIELDS]))),
+    ("confidence", pa.float64()),
+])
+
+# --------------------------------------------
+# WRITING
+# --------------------------------------------
+def _text(x):
+    return None if x is None else str(x)
+
+def _str_list(v):
+    if v is None: return None
+    return [_text(x) for x in (v if isinstance(v, list) else [v])]
+
+def _category(v):
+    if not isinstance(v, dict): return None
+    return {"primary": _text(v.get("primary")), "alternate": _str_list(v.get("alternate"))}
+
+def _address(v):
+    blocks = v if isinstance(v, list) else [v]
+    return [{f: _text(b.get(f)) for f in ADDRESS_FIELDS} if isinstance(b, dict) else None for b in blocks]
+
+def _confidence(x):
+    try: return float(x)
+    except (TypeError, ValueError): return None
+
+def typed_record(place_id, source, record_id, update_time, name, cat, phone, web, socials, addr, confidence):
+    """
+    One NORMALIZED_SOURCES row with parsed JSON values coerced to SCHEMA.
+    Empty values become nulls, like the "" normalize_omf.py writes to the CSV.
+    """
+    return {
+        "place_id": _text(place_id), "source": _text(source), "record_id": _text(record_id),
+        "update_time": _text(update_time), "name": _text(name),
+        "categories": _category(cat) if cat else None,
+        "phone": _str_list(phone) if phone else None,
+        "website": _str_list(web) if web else None,
+        "socials": _str_list(socials) if socials else None,
+        "address": _address(addr) if addr else None,
+        "confidence": _confidence(confidence),
+    }
+
+def conform(arr, typ):
+    """
+    Arrow counterpart of typed_record(): casts a nested Overture column to a
+    SCHEMA type, matching struct fields by name (absent fields become null).
+    """
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    if pa.types.is_struct(typ):
+        children = []
+        for field in typ:
+            has = pa.types.is_struct(arr.type) and arr.type.get_field_index(field.name) >= 0
+            child = pc.struct_field(arr, field.name) if has else pa.nulls(len(arr), field.type)
+            children.append(conform(child, field.type))
+        return pa.StructArray.from_arrays(children, fields=list(typ), mask=arr.is_null())
+    if pa.types.is_list(typ):
+        if not pa.types.is_list(arr.type):
+            return pa.nulls(len(arr), typ)
+        return pa.ListArray.from_arrays(arr.offsets, conform(arr.values, typ.value_type), mask=arr.is_null())
+    return arr.cast(typ)
+
+def conform_column(arr, name):
+    """
+    conform() to SCHEMA's type for column name. Top-level empty lists and
+    all-null structs become null, like the falsy values in typed_record().
+    """
+    typ = SCHEMA.field(name).type
+    out = conform(arr, typ)
+    if pa.types.is_list(typ):
+        non_empty = pc.greater(pc.list_value_length(out), 0)
+    elif pa.types.is_struct(typ):
+        non_empty = pc.is_valid(out.field(0))
+        for i in range(1, typ.num_fields):
+            non_empty = pc.or_(non_empty, pc.is_valid(out.field(i)))
+    else:
+        return out
+    return pc.if_else(pc.fill_null(non_empty, False), out, pa.nulls(len(out), typ))
+
+def normalized_writer(path):
+    """
+    Incremental Parquet writer for NORMALIZED_SOURCES (path's extension is
+    replaced by .parquet). Feed it with write_batch(); use it as a context manager.
+    """
+    return pq.ParquetWriter(Path(path).with_suffix(".parquet"), SCHEMA)
+
+def write_batch(writer, records):
+    """Appends typed_record() rows (or a SCHEMA table) to a normalized_writer() as one row group."""
+    if isinstance(records, pa.Table):
+        writer.write_table(records.cast(SCHEMA))
+    elif records:
+        writer.write_table(pa.Table.from_pylist(records, schema=SCHEMA))
+
+def write_normalized(records, path):
+    """Writes typed_record() rows to a Parquet file in one go and returns its path."""
+    path = Path(path).with_suffix(".parquet")
+    with normalized_writer(path) as writer:
+        write_batch(writer, records)
+    return path
+
+# --------------------------------------------
+# READING
+# --------------------------------------------
+def _plain(v):
+    """Struct values come back with every field; drop the null ones so dicts match the original JSON."""
+    if isinstance(v, dict): return {k: _plain(x) for k, x in v.items() if x is not None}
+    if isinstance(v, list): return [_plain(x) for x in v]
+    return v
+
+def to_json_text(v):
+    """CSV text for a typed value, as normalize_omf.py writes it ("" when empty)."""
+    v = _plain(v)
+    return json.dumps(v) if v else ""
+
+def parse_json(v):
+    """
+    JSON array/object text -> list/dict. Already-parsed values pass through,
+    missing -> None, anything else (plain strings, numbers, bad JSON) is kept.
+    """
+    if v is None or isinstance(v, (list, dict)): return v
+    if not isinstance(v, str): return None if pd.isna(v) else v
+    text = v.strip()
+    if not text: return None
+    if text[0] not in "[{": return v
+    try: return json.loads(text)
+    except ValueError: return v
+
+def find_normalized(stem=NORMALIZED_STEM):
+    """
+    NORMALIZED_SOURCES file for a stem, preferring the typed Parquet copy over
+    the CSV unless the CSV is newer (normalize_omf_all.py rewrites only the
+    CSV). An explicit existing file path is returned unchanged.
+    """
+    stem = Path(stem)
+    if stem.suffix in (".parquet", ".csv") and stem.exists():
+        return stem
+    parquet, csv = stem.with_suffix(".parquet"), stem.with_suffix(".csv")
+    if parquet.exists() and csv.exists():
+        return csv if csv.stat().st_mtime_ns > parquet.stat().st_mtime_ns else parquet
+    for path in (parquet, csv):
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"No normalized sources for {stem} (.parquet, .csv)")
+
+def read_normalized(path, columns=None):
+    """
+    Reads NORMALIZED_SOURCES from Parquet or CSV. The JSON attribute columns
+    come back as Python lists/dicts (None when empty) either way.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        table = pq.read_table(path, columns=columns)
+        df = {}
+        for field in table.schema:
+            col = table.column(field.name)
+            if pa.types.is_nested(field.type):
+                df[field.name] = pd.Series([_plain(v) for v in col.to_pylist()], dtype=object)
+            else:
+                df[field.name] = col.to_pandas()
+        return pd.DataFrame(df)
+
+    df = pd.read_csv(path, usecols=columns)
+    for col in JSON_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.Series([parse_json(v) for v in df[col]], index=df.index, dtype=object)
+    return df
@@ -0,0 +1,123 @@
+"""
+Cache of projected target geometries for the matcher.
+
+matchingdatasets.py reads the merged OMF / Overpass interim files, decodes
+their geometry and reprojects it to EPSG:3857 on every run. load_projected()
+keeps the projected geometry as flat coordinate arrays (shapely ragged
+arrays, one set per geometry type) in an .npz next to the source file, keyed
+by a hash of the source's contents. The .npz also stores the source's mtime
+and size; while those are unchanged the hash is taken from the cache's name
+instead of re-reading the whole source. Repeat runs read only the attribute
+columns and rebuild the geometries from the arrays, with no WKB decoding or
+reprojection. The R-tree itself is rebuilt from the cached geometries on first
+use (GEOS trees cannot be serialized; pickling one re-encodes every geometry).
+"""
+
+import hashlib
+import os
+from pathlib import Path
+import numpy as np
+import shapely
+import geopandas as gpd
+
+from src.utils.interim_storage import read_interim
+
+PROJECTED_CRS = 3857
+
+def source_hash(path, block_size=1 << 20):
+    """Short sha1 of the file's contents."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()[:10]
+
+def _cache_path(path, crs, key):
+    return Path(f"{path}.{key}.epsg{crs}.npz")
+
+def _source_stamp(path):
+    st = Path(path).stat()
+    return np.array([st.st_mtime_ns, st.st_size], dtype=np.int64)
+
+def _read_stamp(cache):
+    with np.load(cache) as npz:
+        return npz["source_stamp"] if "source_stamp" in npz.files else None
+
+def _stamped_key(path, crs):
+    """Hash key of a cache written for the source's current mtime and size, or None."""
+    stamp = _source_stamp(path)
+    for cache in path.parent.glob(f"{path.name}.*.epsg{crs}.npz"):
+        if np.array_equal(_read_stamp(cache), stamp):
+            return cache.name[len(path.name) + 1:].split(".")[0]
+    return None
+
+def _save_geometry(cache, geoms, stamp):
+    """
+    Geometry type per row (-1 for missing) plus the ragged coordinate arrays
+    of each type present, and the source stamp. Returns False for types ragged
+    arrays cannot hold (geometry collections); nothing is written then.
+    """
+    type_ids = shapely.get_type_id(geoms)
+    if (type_ids == shapely.GeometryType.GEOMETRYCOLLECTION).any():
+        return False
+    arrays = {"type_ids": type_ids.astype(np.int8), "source_stamp": stamp}
+    for t in np.unique(type_ids[type_ids >= 0]):
+        _, coords, offsets = shapely.to_ragged_array(geoms[type_ids == t])
+        arrays[f"coords_{t}"] = coords
+        for level, off in enumerate(offsets):
+            arrays[f"offsets_{t}_{level}"] = off
+
+    # Write-then-rename so a crash never leaves a half-written cache
+    tmp = cache.with_name(cache.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, cache)
+    return True
+
+def _load_geometry(cache):
+    with np.load(cache) as npz:
+        type_ids = npz["type_ids"]
+        geoms = np.full(len(type_ids), None, dtype=object)
+        for t in np.unique(type_ids[type_ids >= 0]):
+            offsets = []
+            while f"offsets_{t}_{len(offsets)}" in npz.files:
+                offsets.append(npz[f"offsets_{t}_{len(offsets)}"])
+            geoms[type_ids == t] = shapely.from_ragged_array(
+                shapely.GeometryType(int(t)), npz[f"coords_{t}"], tuple(offsets) or None
+            )
+    return geoms
+
+def load_projected(path, crs=PROJECTED_CRS, cache=True):
+    """
+    read_interim(path).to_crs(crs), with the projected geometry served from
+    (and saved to) the coordinate cache while the source is unchanged.
+    Caches of older versions of the source are removed when a new one is written.
+    The source's hash is kept in gdf.attrs["source_hash"].
+    """
+    path = Path(path)
+    if not cache:
+        gdf = read_interim(path).to_crs(epsg=crs)
+        gdf.attrs["source_hash"] = source_hash(path)
+        return gdf
+
+    stamp = _source_stamp(path)
+    key = _stamped_key(path, crs) or source_hash(path)
+    cached = _cache_path(path, crs, key)
+    if cached.exists():
+        attrs = read_interim(path, geometry=False)
+        geoms = _load_geometry(cached)
+        if len(geoms) == len(attrs):
+            # Same contents under a new mtime (or a pre-stamp cache): re-stamp so the next run skips hashing
+            if not np.array_equal(_read_stamp(cached), stamp):
+                _save_geometry(cached, geoms, stamp)
+            gdf = gpd.GeoDataFrame(attrs, geometry=geoms, crs=f"EPSG:{crs}")
+            gdf.attrs["source_hash"] = key
+            return gdf
+
+    gdf = read_interim(path).to_crs(epsg=crs)
+    gdf.attrs["source_hash"] = key
+    for stale in path.parent.glob(f"{path.name}.*.epsg{crs}.npz"):
+        stale.unlink()
+    if _save_geometry(cached, np.asarray(gdf.geometry.values, dtype=object), stamp):
+        print(f"Cached projected geometry: {cached}")
+    return gdf
@@ -0,0 +1,106 @@
+"""
+Shared text normalizers for names, addresses, cities and categories.
+
+Every stage used to carry its own clean_text() and .apply() it cell by cell.
+The variants below keep each stage's exact output; they are memoized on the
+raw string because business names, streets and cities repeat heavily:
+
+  fold_text   unidecode(strip(lower(x))), blank -> missing  (normalization, matching)
+  scrub_text  lower, non [a-z0-9 ] -> space, squeezed       (OMF/Yelp comparison)
+  alnum_text  lower, non-alphanumeric -> space, squeezed    (evaluation scripts)
+
+normalize_column() applies one of them to a whole column (pandas Series,
+NumPy or Arrow array) by dictionary-encoding it first, so each distinct value
+is normalized once per call and once per process through the cache.
+"""
+
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from unidecode import unidecode
+
+CACHE_SIZE = 2 ** 18
+_NON_ASCII_ALNUM = re.compile(r"[^a-z0-9 ]")
+_SPACES = re.compile(r"\s+")
+_NON_WORD = re.compile(r"[^\w ]|_")  # \w is str.isalnum() plus "_"
+
+# --------------------------------------------
+# CACHED KERNELS (str -> str)
+# --------------------------------------------
+@lru_cache(maxsize=CACHE_SIZE)
+def _fold(s):
+    s = s.strip()
+    return unidecode(s.lower()) if s else None
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _scrub(s):
+    return _SPACES.sub(" ", _NON_ASCII_ALNUM.sub(" ", s.lower())).strip()
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _alnum(s):
+    return " ".join(_NON_WORD.sub(" ", s.lower()).split())
+
+# --------------------------------------------
+# SCALAR API
+# --------------------------------------------
+def fold_text(x, missing=np.nan):
+    """Lowercased, stripped, ASCII-transliterated text; missing for null/blank values."""
+    if not isinstance(x, str):
+        if pd.isnull(x): return missing
+        x = str(x)
+    out = _fold(x)
+    return missing if out is None else out
+
+def scrub_text(x):
+    """Lowercase ASCII letters/digits separated by single spaces ("" for falsy values)."""
+    if not x: return ""
+    return _scrub(x if isinstance(x, str) else str(x))
+
+def alnum_text(x):
+    """Like scrub_text() but keeps any Unicode letter/digit ("" for nulls)."""
+    if not isinstance(x, str):
+        if pd.isna(x): return ""
+        x = str(x)
+    return _alnum(x)
+
+# --------------------------------------------
+# BATCH API
+# --------------------------------------------
+def _normalize_values(vals, normalizer, kwargs):
+    """normalizer over a 1-D object array, once per distinct string."""
+    is_str = np.fromiter((isinstance(v, str) for v in vals), dtype=bool, count=len(vals))
+    out = np.empty(len(vals), dtype=object)
+    codes, uniques = pd.factorize(vals[is_str])
+    out[is_str] = np.array([normalizer(u, **kwargs) for u in uniques] + [None], dtype=object)[codes]
+    # Nulls and numbers go one by one: None vs NaN matters to scrub_text(), and 1 == 1.0 would share a code
+    other = ~is_str
+    if other.any():
+        out[other] = [normalizer(v, **kwargs) for v in vals[other]]
+    return out
+
+def normalize_column(values, normalizer=fold_text, **kwargs):
+    """
+    normalizer (plus keyword args, e.g. missing=None for fold_text) over a
+    whole column. Returns the same kind of container it was given: a Series
+    (same index, dtype inferred like Series.map), an object ndarray, or a
+    string Arrow array (nulls for None/NaN results).
+    """
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        encoded = pc.dictionary_encode(values)
+        dictionary = [normalizer(v, **kwargs) for v in encoded.dictionary.to_pylist()]
+        out = np.array(dictionary + [normalizer(None, **kwargs)], dtype=object)
+        idx = encoded.indices.fill_null(len(dictionary)).to_numpy(zero_copy_only=False)
+        return pa.array(out[idx], type=pa.string(), from_pandas=True)
+    if isinstance(values, pd.Series):
+        out = _normalize_values(values.to_numpy(dtype=object), normalizer, kwargs)
+        return pd.Series(out.tolist(), index=values.index, name=values.name)
+    return _normalize_values(np.asarray(values, dtype=object), normalizer, kwargs)
+
+def cache_info():
+    """lru_cache statistics per normalizer kernel."""
+    return {f.__name__.lstrip("_"): f.cache_info() for f in (_fold, _scrub, _alnum)}
@@ -0,0 +1,94 @@
+"""
+Shared loader for the Yelp academic business JSON (one object per line).
+
+Streams the file with orjson and keeps only the requested fields, appending
+straight into per-field column lists instead of building a dict per row.
+The projected table can be cached as Parquet next to the source file; the
+cache is keyed by the requested fields and reused only while the source's
+mtime and size are unchanged.
+"""
+
+import hashlib
+from pathlib import Path
+import orjson
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+YELP_FIELDS = [
+    "business_id", "name", "address", "city", "state", "postal_code",
+    "latitude", "longitude", "categories"
+]
+
+def _cache_path(path, fields):
+    key = hashlib.sha1(",".join(fields).encode()).hexdigest()[:10]
+    return Path(f"{path}.{key}.parquet")
+
+def _source_stamp(path):
+    st = Path(path).stat()
+    return {b"source_mtime_ns": str(st.st_mtime_ns).encode(), b"source_size": str(st.st_size).encode()}
+
+def _read_cache(path, fields):
+    cache = _cache_path(path, fields)
+    if not cache.exists():
+        return None
+    meta = pq.read_schema(cache).metadata or {}
+    stamp = _source_stamp(path)
+    if any(meta.get(k) != v for k, v in stamp.items()):
+        return None
+    return _with_object_text(pq.read_table(cache).to_pandas())
+
+def _write_cache(df, path, fields):
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        print(f"Yelp cache skipped ({e})")
+        return
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **_source_stamp(path)})
+    pq.write_table(table, _cache_path(path, fields))
+
+def _with_object_text(df):
+    """
+    Non-numeric columns as object dtype with None for missing values, the
+    same as building the frame from a list of dicts.
+    """
+    for c in df.columns:
+        if not (is_numeric_dtype(df[c]) or is_bool_dtype(df[c])):
+            df[c] = df[c].astype(object).where(df[c].notna(), None)
+    return df
+
+def stream_yelp_columns(path, fields):
+    """
+    Returns {field: list} for every parseable line of path. Missing keys and
+    JSON nulls both come back as None; unparseable lines are skipped.
+    """
+    columns = {f: [] for f in fields}
+    appenders = [(f, columns[f].append) for f in fields]
+    loads = orjson.loads
+    with open(path, "rb") as fin:
+        for line in fin:
+            try:
+                obj = loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            get = obj.get
+            for f, append in appenders:
+                append(get(f))
+    return columns
+
+def load_yelp(path, fields=YELP_FIELDS, cache=True):
+    """
+    Loads the requested fields of the Yelp business file as a DataFrame,
+    one row per parseable line, columns in the order of fields.
+    """
+    fields = list(fields)
+    if cache:
+        cached = _read_cache(path, fields)
+        if cached is not None:
+            return cached
+
+    df = _with_object_text(pd.DataFrame(stream_yelp_columns(path, fields), columns=fields))
+    if cache:
+        _write_cache(df, path, fields)
+    return df
@@ -0,0 +1,86 @@
+"""process_chunk_batched() against the row-wise process_chunk(), on a small metric fixture."""
+
+import os
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+
+@pytest.fixture(scope="module")
+def md(tmp_path_factory):
+    # matchingdatasets creates ../data/interim on import
+    scripts = tmp_path_factory.mktemp("run") / "scripts"
+    scripts.mkdir()
+    cwd = os.getcwd()
+    os.chdir(scripts)
+    try:
+        import matchingdatasets
+    finally:
+        os.chdir(cwd)
+    return matchingdatasets
+
+
+@pytest.fixture
+def frames():
+    targets = gpd.GeoDataFrame({
+        "id": ["t0", "t1", "t2", "t3", "t4", "t5", "t6", "t7"],
+        "name": ["Joes Pizza", "joes pizza", "Corner Cafe", "joes pizza", None, "Bar", "Bar", "Far Away"],
+        "address": "x",
+    }, geometry=[
+        Point(300, 0),     # t0/t1/t3: same score for "joes pizza"; t3 is nearest, t0 is first in row order
+        Point(0, 250),
+        Point(5000, 0),
+        Point(100, 0),
+        Point(5000, 40),
+        Point(9000, 100),  # t5/t6: equally near to the "bar" row (a distance tie)
+        Point(9000, -100),
+        Point(-50000, -50000),  # outside every chunk's local_target bbox
+    ], crs=3857)
+    targets["name_clean"] = targets["name"].str.lower()
+
+    yelp = gpd.GeoDataFrame({
+        "business_id": ["y0", "y1", "y2", "y3", "y4"],
+        "name": ["joes pizza", "corner cafe", "sushi place", None, "bar"],
+        "address": "y",
+    }, geometry=[
+        Point(0, 0),
+        Point(5000, 20),
+        Point(5000, 10),   # candidates only below the score threshold
+        Point(5000, 30),   # no name
+        Point(9000, 0),
+    ], crs=3857, index=pd.RangeIndex(10, 15))
+    yelp["name_clean"] = yelp["name"]
+    yelp = pd.concat([yelp, gpd.GeoDataFrame(  # nothing within MAX_DISTANCE_METERS
+        {"business_id": ["y5"], "name": ["joes pizza"], "address": "y", "name_clean": ["joes pizza"]},
+        geometry=[Point(1e6, 1e6)], crs=3857, index=[15])])
+    return yelp, targets
+
+
+def by_row_and_target(df):
+    """Distance ties in sjoin_nearest come in GEOS search order; compare them in target row order."""
+    return df.reset_index().sort_values(["index", "index_right"], kind="stable").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("local", [False, True], ids=["global", "local_target"])
+def test_batched_matches_row_wise(md, frames, local):
+    yelp, targets = frames
+    target_proj, target_index = targets, targets.sindex
+    if local:
+        target_proj, target_index = md.local_target(yelp, targets, targets.sindex)
+        assert len(target_proj) < len(targets)
+
+    legacy = md.process_chunk(yelp, target_proj, target_index)
+    batched = md.process_chunk_batched(yelp, target_proj, target_index)
+
+    assert list(batched.columns) == list(legacy.columns)
+    pd.testing.assert_frame_equal(by_row_and_target(batched), by_row_and_target(legacy), check_dtype=False)
+
+    best = batched.groupby(level=0)[["matched_id", "matched_name_score"]].first()
+    # Equal scores resolve to the first candidate in target row order, not the nearest one
+    assert best.loc[10, "matched_id"] == "t0"
+    assert best.loc[11, "matched_id"] == "t2"
+    assert best.loc[[12, 13, 15], "matched_id"].isna().all()
+    assert best.loc[14, "matched_id"] == "t5"
+    assert batched.loc[[14], "index_right"].tolist() == [5, 6]
@@ -0,0 +1,56 @@
+"""normalizeAllCities.py driver followed by mergedatasets.py, in a throwaway data tree."""
+
+import json
+import subprocess
+import sys
+
+import geopandas as gpd
+from shapely.geometry import Point
+
+from conftest import SCRIPTS
+
+
+def write_raw_omf(path, n, lon, lat):
+    features = [{
+        "type": "Feature",
+        "properties": {"id": f"{path.stem}-{i}", "name": f"Place {i}", "category": "cafe", "address": f"{i} Main St"},
+        "geometry": {"type": "Point", "coordinates": [lon + i * 1e-4, lat]},
+    } for i in range(n)]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+
+
+def run(script, cwd, *args):
+    proc = subprocess.run([sys.executable, str(SCRIPTS / script), *args], cwd=cwd,
+                          capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    return proc.stdout
+
+
+def test_driver_then_merge_counts_each_city_once(tmp_path):
+    raw, interim, scripts = tmp_path / "data/raw", tmp_path / "data/interim", tmp_path / "scripts"
+    for d in (raw, interim, scripts):
+        d.mkdir(parents=True)
+    write_raw_omf(raw / "omf_madison.geojson", 5, -89.4, 43.07)
+    write_raw_omf(raw / "omf_santa_barbara.geojson", 7, -119.7, 34.42)
+
+    # Output of an older run under the underscored spelling, in the other interim format
+    stale = interim / "omf_santa_barbara_normalized.geojson"
+    gpd.GeoDataFrame({"id": ["old"], "name": ["old"]}, geometry=[Point(-119.7, 34.42)], crs=4326).to_file(stale)
+    gpd.GeoDataFrame({"id": ["o1"], "name": ["x"]}, geometry=[Point(-89.4, 43.07)], crs=4326).to_parquet(
+        interim / "overpass_madison_normalized.parquet")
+
+    out = run("normalizeAllCities.py", scripts, "--stages", "omf", "--workers", "1")
+    assert "santabarbara" in out and "WARNING" not in out
+    assert not stale.exists()
+
+    out = run("mergedatasets.py", scripts)
+    assert "Merged 2 OMF files" in out
+    merged = gpd.read_parquet(interim / "omf_all_merged.parquet")
+    assert len(merged) == 12
+
+
+def test_driver_warns_when_a_stage_has_no_inputs(tmp_path):
+    (tmp_path / "data/raw").mkdir(parents=True)
+    (tmp_path / "scripts").mkdir()
+    out = run("normalizeAllCities.py", tmp_path / "scripts", "--stages", "geojson", "--workers", "1")
+    assert "WARNING: geojson found no omf_*.csv inputs" in out
@@ -0,0 +1,44 @@
+"""load_projected() hashes its source only when the cached stamp no longer matches."""
+
+import os
+
+import geopandas as gpd
+from shapely.geometry import Point
+
+from src.utils import projection_cache
+
+
+def write_target(path, names):
+    gdf = gpd.GeoDataFrame({"id": names, "name": names},
+                           geometry=[Point(-89.4 + i * 1e-3, 43.07) for i in range(len(names))], crs=4326)
+    gdf.to_parquet(path)
+
+
+def test_cache_hit_skips_hashing(tmp_path, monkeypatch):
+    path = tmp_path / "omf_all_merged.parquet"
+    write_target(path, ["a", "b", "c"])
+    hashed = []
+    full_hash = projection_cache.source_hash
+    monkeypatch.setattr(projection_cache, "source_hash", lambda p: hashed.append(p) or full_hash(p))
+
+    first = projection_cache.load_projected(path)
+    assert len(hashed) == 1
+
+    second = projection_cache.load_projected(path)
+    assert len(hashed) == 1
+    assert second.attrs["source_hash"] == first.attrs["source_hash"]
+    assert second.geometry.geom_equals_exact(first.geometry, 1e-9).all()
+
+    # Same contents, new mtime: hashed once, then re-stamped
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert projection_cache.load_projected(path).attrs["source_hash"] == first.attrs["source_hash"]
+    projection_cache.load_projected(path)
+    assert len(hashed) == 2
+
+    # New contents: new hash, old cache replaced
+    write_target(path, ["a", "b", "c", "d"])
+    changed = projection_cache.load_projected(path)
+    assert len(changed) == 4
+    assert changed.attrs["source_hash"] != first.attrs["source_hash"]
+    assert [p.name for p in tmp_path.glob("*.npz")] == [f"{path.name}.{changed.attrs['source_hash']}.epsg3857.npz"]